@@ -3,21 +3,59 @@
 SQLite 데이터베이스 연결과 SQLAlchemy 세션을 관리합니다.
 """
 import os
-from sqlalchemy import create_engine
+import sqlite3
+import threading
+import time
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.pool import QueuePool
 from typing import Generator
 
 from models import Base
 
 # 데이터베이스 파일 경로 설정
-DATABASE_URL = "sqlite:///./database.sqlite"
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATABASE_PATH = os.path.join(BASE_DIR, "database.sqlite")
 
+# 현재 사용 중인 데이터베이스 파일명을 기록하는 포인터 파일
+# (인덱스 재구축 후 이 파일을 원자적으로 교체하여 새 데이터베이스로 전환합니다)
+ACTIVE_DATABASE_POINTER = os.path.join(BASE_DIR, "database.active")
+# 포인터 파일 변경 확인 주기 (초)
+ACTIVE_DATABASE_CHECK_INTERVAL = 1.0
+
+_active_database = {"path": None, "pointer_mtime": None, "checked": 0.0}
+_active_database_lock = threading.Lock()
+
+
+def _read_active_database_path() -> str:
+    """포인터 파일에 기록된 데이터베이스 경로를 반환합니다. (없으면 기본 경로)"""
+    try:
+        with open(ACTIVE_DATABASE_POINTER, 'r', encoding='utf-8') as f:
+            filename = f.read().strip()
+        if filename:
+            return os.path.join(BASE_DIR, filename)
+    except FileNotFoundError:
+        pass
+    return DATABASE_PATH
+
+
+def get_database_path() -> str:
+    """현재 사용 중인 데이터베이스 파일 경로"""
+    if _active_database["path"] is None:
+        refresh_active_database(force=True)
+    return _active_database["path"]
+
+
+def _connect():
+    return sqlite3.connect(get_database_path(), check_same_thread=False)  # SQLite에서 멀티스레드 허용
+
+
 # SQLAlchemy 엔진 생성
+# 연결할 때마다 현재 데이터베이스 경로를 확인하므로, 파일이 교체되면 새 연결은 새 파일을 사용합니다.
 engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False},  # SQLite에서 멀티스레드 허용
+    "sqlite://",
+    creator=_connect,
+    poolclass=QueuePool,
     echo=False  # SQL 쿼리 로깅 (개발 시 True로 설정 가능)
 )
 
@@ -25,15 +63,91 @@ engine = create_engine(
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
+def refresh_active_database(force: bool = False) -> bool:
+    """
+    포인터 파일이 바뀌었는지 확인하고, 바뀌었으면 연결 풀을 비웁니다.
+    이미 사용 중인 연결은 요청이 끝날 때까지 이전 파일을 사용하고 반환 시 닫히므로,
+    처리 중인 요청은 끊기지 않습니다.
+
+    Returns:
+        bool: 데이터베이스 파일이 바뀌었는지 여부
+    """
+    now = time.monotonic()
+    if not force and now - _active_database["checked"] < ACTIVE_DATABASE_CHECK_INTERVAL:
+        return False
+
+    with _active_database_lock:
+        _active_database["checked"] = now
+        try:
+            pointer_mtime = os.stat(ACTIVE_DATABASE_POINTER).st_mtime_ns
+        except FileNotFoundError:
+            pointer_mtime = None
+        if not force and pointer_mtime == _active_database["pointer_mtime"]:
+            return False
+
+        _active_database["pointer_mtime"] = pointer_mtime
+        new_path = _read_active_database_path()
+        if new_path == _active_database["path"]:
+            return False
+
+        changed = _active_database["path"] is not None
+        _active_database["path"] = new_path
+
+    if changed:
+        engine.dispose()
+        print(f"데이터베이스 전환: {new_path}")
+    return changed
+
+
+def activate_database(database_path: str):
+    """
+    포인터 파일을 원자적으로 교체하여 database_path를 사용 중인 데이터베이스로 지정합니다.
+    실행 중인 API/watcher 프로세스는 다음 세션부터 새 파일을 사용합니다.
+    """
+    temp_pointer = f"{ACTIVE_DATABASE_POINTER}.{os.getpid()}.tmp"
+    with open(temp_pointer, 'w', encoding='utf-8') as f:
+        f.write(os.path.relpath(database_path, BASE_DIR))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_pointer, ACTIVE_DATABASE_POINTER)
+    refresh_active_database(force=True)
+
+
 def create_tables():
     """데이터베이스 테이블을 생성합니다."""
     Base.metadata.create_all(bind=engine)
+    _add_missing_columns()
+
+
+def _add_missing_columns():
+    """
+    기존 데이터베이스 파일에 모델에 새로 추가된 컬럼과 인덱스를 보완합니다.
+    (create_all은 이미 존재하는 테이블을 변경하지 않습니다)
+    """
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        missing = [column for column in table.columns if column.name not in existing]
+        if not missing:
+            continue
+
+        with engine.begin() as connection:
+            for column in missing:
+                column_type = column.type.compile(dialect=engine.dialect)
+                connection.execute(text(
+                    f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"
+                ))
+                print(f"컬럼 추가: {table.name}.{column.name}")
+
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
 
 
 def get_db() -> Generator[Session, None, None]:
     """
     FastAPI의 Dependency Injection을 위한 데이터베이스 세션 제공자
     """
+    refresh_active_database()
     db = SessionLocal()
     try:
         yield db
@@ -46,6 +160,7 @@ def get_db_session() -> Session:
     일반적인 용도로 데이터베이스 세션을 반환합니다.
     사용 후 반드시 close()를 호출해야 합니다.
     """
+    refresh_active_database()
     return SessionLocal()
 
 
@@ -55,6 +170,15 @@ def init_database():
     - 테이블 생성
     - 필요한 디렉토리 생성
     """
+    init_directories()
+    
+    # 테이블 생성
+    create_tables()
+    print(f"데이터베이스가 초기화되었습니다: {get_database_path()}")
+
+
+def init_directories():
+    """캐시/로그 디렉토리를 생성합니다. (첫 요청 처리에는 필요하지 않음)"""
     # 데이터베이스 디렉토리 생성
     os.makedirs(BASE_DIR, exist_ok=True)
     
@@ -69,17 +193,13 @@ def init_database():
     # 로그 디렉토리 생성
     logs_dir = os.path.join(BASE_DIR, "logs")
     os.makedirs(logs_dir, exist_ok=True)
-    
-    # 테이블 생성
-    create_tables()
-    print(f"데이터베이스가 초기화되었습니다: {DATABASE_PATH}")
 
 
 def check_database_connection() -> bool:
     """데이터베이스 연결 상태를 확인합니다."""
     try:
         with engine.connect() as connection:
-            connection.execute("SELECT 1")
+            connection.execute(text("SELECT 1"))
         return True
     except Exception as e:
         print(f"데이터베이스 연결 실패: {e}")
@@ -0,0 +1,292 @@
+"""
+실시간 인덱스 변경 알림
+watcher 프로세스는 레코드를 변경하는 트랜잭션 안에서 record_events 테이블에 이벤트를 기록하고,
+API 서버는 이 테이블을 기본키 범위로 짧게 조회하여 구독 중인 클라이언트(SSE)에 변경분만 전달합니다.
+"""
+import asyncio
+import json
+import os
+import time
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session
+
+from database import get_database_path, get_db_session, refresh_active_database
+from models import MedicalRecord, PendingReplay, RecordEvent
+
+# API 서버의 이벤트 조회 주기 (초)
+EVENT_POLL_INTERVAL = 0.5
+# 한 번에 읽는 최대 이벤트 수
+EVENT_BATCH_SIZE = 500
+# 이벤트 보관 기간 (재연결 시 Last-Event-ID 이후 이벤트를 다시 보내기 위함)
+EVENT_RETENTION = timedelta(hours=1)
+EVENT_PRUNE_INTERVAL = 600
+# 구독자별 대기열 크기 (가득 차면 해당 구독자에게 resync를 요청)
+SUBSCRIBER_QUEUE_SIZE = 1000
+
+
+def record_event(db: Session, action: str, record: MedicalRecord,
+                 file_path: Optional[str] = None):
+    """
+    레코드 변경 이벤트를 현재 트랜잭션에 추가합니다.
+    호출한 쪽의 commit과 함께 기록되므로 커밋된 변경만 알림으로 전달됩니다.
+
+    Args:
+        file_path: 변경 전 경로 (이동한 경우). 생략하면 레코드의 현재 경로
+    """
+    db.add(RecordEvent(
+        action=action,
+        record_id=record.id,
+        patient_name=record.patient_name,
+        patient_id=record.patient_id,
+        file_path=file_path or getattr(record, 'file_path', None),
+        payload=None if action == "deleted" else json.dumps(record.to_dict(), ensure_ascii=False),
+    ))
+
+
+class Subscription:
+    """SSE 구독자 (환자 등록번호 또는 검색어 필터)"""
+
+    def __init__(self, patient_id: Optional[str] = None, q: Optional[str] = None):
+        self.patient_id = patient_id
+        self.q = q
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def matches(self, event: Dict) -> bool:
+        """이벤트가 구독 조건에 해당하는지 확인합니다. (검색 API와 같은 규칙)"""
+        if self.patient_id and event['patient_id'] != self.patient_id:
+            return False
+        if self.q:
+            if self.q.isdigit():
+                return self.q in (event['patient_id'] or '')
+            return self.q in (event['patient_name'] or '')
+        return True
+
+    def push(self, event: Dict):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # 너무 느린 구독자는 대기열을 비우고 다시 검색하도록 알립니다.
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({'event_id': event['event_id'], 'action': 'resync'})
+
+
+def _event_to_dict(event: RecordEvent) -> Dict:
+    return {
+        'event_id': event.id,
+        'action': event.action,
+        'record_id': event.record_id,
+        'patient_name': event.patient_name,
+        'patient_id': event.patient_id,
+        'record': json.loads(event.payload) if event.payload else None,
+    }
+
+
+def fetch_events(after_id: int, limit: int = EVENT_BATCH_SIZE) -> List[Dict]:
+    """after_id 이후의 이벤트를 조회합니다."""
+    db = get_db_session()
+    try:
+        events = db.query(RecordEvent).filter(
+            RecordEvent.id > after_id
+        ).order_by(RecordEvent.id).limit(limit).all()
+        return [_event_to_dict(event) for event in events]
+    finally:
+        db.close()
+
+
+def latest_event_id() -> int:
+    db = get_db_session()
+    try:
+        return db.query(func.max(RecordEvent.id)).scalar() or 0
+    finally:
+        db.close()
+
+
+def prune_events(delivered_id: int):
+    """
+    보관 기간이 지난 이벤트를 삭제합니다. (delivered_id 미만, 이미 전달한 이벤트만)
+    created_at은 SQLite의 CURRENT_TIMESTAMP(UTC)로 기록되므로 기준 시각도 SQLite에서 계산합니다.
+    마지막 이벤트는 남겨 둡니다. 테이블이 비면 SQLite가 id를 1부터 다시 발급하여
+    브로커와 재연결 구독자의 커서가 새 이벤트를 건너뛰게 됩니다.
+    """
+    cutoff = func.datetime('now', f'-{int(EVENT_RETENTION.total_seconds())} seconds')
+    db = get_db_session()
+    try:
+        db.query(RecordEvent).filter(
+            RecordEvent.id < delivered_id,
+            RecordEvent.created_at < cutoff,
+        ).delete(synchronize_session=False)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+class ChangeReplayer:
+    """
+    인덱스 재구축 중 이전 데이터베이스에 기록된 변경을 새 데이터베이스에 다시 반영합니다.
+    이전 데이터베이스의 record_events를 last_event_id 이후부터 순서대로 읽어 변경 전 경로의 레코드를 지우고,
+    삭제가 아니면 이전 데이터베이스의 현재 행을 복사합니다. (같은 이벤트를 다시 반영해도 결과는 같음)
+    반영한 변경은 대상 데이터베이스에도 이벤트로 기록하므로 구독 중인 클라이언트에 전달됩니다.
+    """
+
+    def __init__(self, source_path: str, last_event_id: Optional[int] = None):
+        self.source_path = source_path
+        self.source_engine = create_engine(f"sqlite:///{source_path}")
+        if last_event_id is None:
+            with self.source_engine.connect() as source:
+                last_event_id = source.execute(select(func.max(RecordEvent.id))).scalar() or 0
+        self.last_event_id = last_event_id
+        self.replayed = 0
+
+    def apply(self, db: Session) -> int:
+        """
+        아직 반영하지 않은 변경을 db에 반영하고 반영한 이벤트 수를 반환합니다.
+        커밋은 호출한 쪽에서 합니다.
+        """
+        records = MedicalRecord.__table__
+        with self.source_engine.connect() as source:
+            events = source.execute(
+                select(RecordEvent.id, RecordEvent.action, RecordEvent.record_id, RecordEvent.file_path)
+                .where(RecordEvent.id > self.last_event_id)
+                .order_by(RecordEvent.id)
+            ).all()
+            for event in events:
+                if event.file_path:
+                    for record in db.query(MedicalRecord).filter(
+                        MedicalRecord.file_path == event.file_path
+                    ):
+                        record_event(db, "deleted", record)
+                        db.delete(record)
+                    # 같은 경로로 다시 추가하는 경우 삭제가 먼저 반영되어야 합니다.
+                    db.flush()
+                if event.action != "deleted":
+                    row = source.execute(
+                        select(records).where(records.c.id == event.record_id)
+                    ).mappings().first()
+                    if row:
+                        values = dict(row)
+                        values.pop('id')
+                        record = db.query(MedicalRecord).filter(
+                            MedicalRecord.file_path == values['file_path']
+                        ).first()
+                        action = "updated" if record else "created"
+                        if record is None:
+                            record = MedicalRecord()
+                            db.add(record)
+                        for key, value in values.items():
+                            setattr(record, key, value)
+                        db.flush()
+                        record_event(db, action, record)
+                self.last_event_id = event.id
+        db.flush()
+        self.replayed += len(events)
+        return len(events)
+
+    def dispose(self):
+        self.source_engine.dispose()
+
+
+def apply_pending_replays(db: Session) -> int:
+    """
+    인덱스 재구축 후 아직 반영하지 않은 이전 데이터베이스의 변경을 현재 데이터베이스에 반영하고 커밋합니다.
+    watcher가 교체된 데이터베이스에 다른 변경을 쓰기 전에 호출하므로, 이전 파일의 변경이
+    교체 후의 변경(예: 같은 파일의 삭제)을 덮어쓰지 않습니다.
+
+    Returns:
+        int: 반영한 이벤트 수
+    """
+    replayed = 0
+    for pending in db.query(PendingReplay).order_by(PendingReplay.id).all():
+        if os.path.exists(pending.source_path):
+            replayer = ChangeReplayer(pending.source_path, pending.last_event_id)
+            try:
+                replayed += replayer.apply(db)
+            finally:
+                replayer.dispose()
+        db.delete(pending)
+    db.commit()
+    return replayed
+
+
+class RecordEventBroker:
+    """record_events 테이블을 구독자들에게 중계하는 브로커"""
+
+    def __init__(self):
+        self.subscribers: List[Subscription] = []
+        self.last_event_id = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        self.last_event_id = await loop.run_in_executor(None, latest_event_id)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def subscribe(self, patient_id: Optional[str] = None, q: Optional[str] = None,
+                        last_event_id: Optional[int] = None) -> Subscription:
+        """구독을 등록합니다. last_event_id가 있으면 그 이후의 놓친 이벤트를 먼저 전달합니다."""
+        subscription = Subscription(patient_id, q)
+        if last_event_id is not None and last_event_id < self.last_event_id:
+            loop = asyncio.get_running_loop()
+            missed = await loop.run_in_executor(None, fetch_events, last_event_id)
+            if len(missed) >= EVENT_BATCH_SIZE:
+                # 놓친 이벤트가 너무 많으면 다시 검색하도록 알립니다.
+                subscription.push({'event_id': self.last_event_id, 'action': 'resync'})
+            else:
+                for event in missed:
+                    if event['event_id'] <= self.last_event_id and subscription.matches(event):
+                        subscription.push(event)
+        self.subscribers.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        if subscription in self.subscribers:
+            self.subscribers.remove(subscription)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        last_prune = 0.0
+        database_path = get_database_path()
+        while True:
+            events = []
+            try:
+                # 인덱스 재구축으로 데이터베이스 파일이 교체되면 이벤트 번호가 새로 시작되므로,
+                # 기준 번호를 다시 잡고 모든 구독자에게 다시 검색하도록 알립니다.
+                refresh_active_database()
+                if get_database_path() != database_path:
+                    database_path = get_database_path()
+                    self.last_event_id = await loop.run_in_executor(None, latest_event_id)
+                    for subscription in list(self.subscribers):
+                        subscription.push({'event_id': self.last_event_id, 'action': 'resync'})
+
+                events = await loop.run_in_executor(None, fetch_events, self.last_event_id)
+                for event in events:
+                    self.last_event_id = event['event_id']
+                    for subscription in list(self.subscribers):
+                        if subscription.matches(event):
+                            subscription.push(event)
+
+                if time.monotonic() - last_prune > EVENT_PRUNE_INTERVAL:
+                    last_prune = time.monotonic()
+                    await loop.run_in_executor(None, prune_events, self.last_event_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"이벤트 조회 실패: {e}")
+
+            # 한 번에 다 읽지 못했으면 바로 이어서 조회합니다.
+            if len(events) < EVENT_BATCH_SIZE:
+                await asyncio.sleep(EVENT_POLL_INTERVAL)
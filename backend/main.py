@@ -2,22 +2,65 @@
 환자 검사 통합 뷰어 백엔드 API
 FastAPI를 사용한 메인 애플리케이션
 """
-from fastapi import FastAPI, Depends, HTTPException, Query
-from fastapi.responses import FileResponse, StreamingResponse
+import time
+
+# 시작 시간 측정 기준점 (모듈 import 시작 시각)
+_IMPORT_STARTED = time.perf_counter()
+
+import asyncio
+import json
+import threading
+from fastapi import FastAPI, Depends, HTTPException, Query, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
+from urllib.parse import quote
 import os
-import uvicorn
 
 # 로컬 모듈 import
 try:
-    from database import get_db, init_database, check_database_connection
+    from database import engine, get_db, create_tables, init_directories, check_database_connection
     from models import MedicalRecord
     from utils.file_parser import FileNameParser
+    from utils.cache import compute_fingerprint
+    from utils import converter
+    from utils.tiles import ensure_pyramid, get_tile
+    from utils.zip_stream import iter_zip_stream
+    from events import RecordEventBroker, record_event
+    from utils.prefetch import DerivativePrefetcher, PrefetchItem
+    from utils.timing import (
+        ServerTimingMiddleware, SlowRequestProfiler, install_sqlalchemy_timing, phase,
+        run_phase_in_threadpool,
+    )
 except ImportError:
     print("Warning: Local modules not found. Running in development mode.")
 
 
+# 시작 시간 지표 (import 시간, 첫 /api/health 응답까지의 시간)
+startup_metrics = {
+    "import_ms": round((time.perf_counter() - _IMPORT_STARTED) * 1000, 1),
+    "first_health_ms": None,
+}
+
+# 캐시 크기는 디렉토리 전체를 순회해야 하므로 백그라운드에서 주기적으로 집계합니다.
+CACHE_SIZE_REFRESH_SECONDS = 60
+_cache_size = {"value": "Unknown", "updated": 0.0}
+_cache_size_lock = threading.Lock()
+
+
+# 검색 후 썸네일을 미리 생성할 상위 결과 수 / PDF 변환까지 미리 할 결과 수
+PREFETCH_TOP_N = 12
+PREFETCH_OPEN_N = 2
+
+# SSE 연결 유지를 위한 keepalive 주기 (초)
+SSE_KEEPALIVE_SECONDS = 15
+
+# 응답 시작까지 이 시간(ms)을 넘긴 요청은 샘플링 프로파일을 logs/profiles/에 저장 (0이면 끔)
+SLOW_REQUEST_MS = float(os.environ.get("SLOW_REQUEST_MS", "1000"))
+PROFILE_SAMPLE_INTERVAL_MS = 5
+
+
 # FastAPI 앱 생성
 app = FastAPI(
     title="환자 검사 통합 뷰어 API",
@@ -25,21 +68,101 @@ app = FastAPI(
     version="1.0.0",
 )
 
+# 요청별 구간 시간(DB, stat, 렌더링, 인코딩)을 Server-Timing 헤더로 반환
+app.add_middleware(
+    ServerTimingMiddleware,
+    profiler=(
+        SlowRequestProfiler(SLOW_REQUEST_MS, PROFILE_SAMPLE_INTERVAL_MS)
+        if SLOW_REQUEST_MS > 0 else None
+    ),
+)
+install_sqlalchemy_timing(engine)
+
+# watcher가 기록한 인덱스 변경을 구독자에게 중계
+event_broker = RecordEventBroker()
+
+# 검색 결과 상위 항목의 썸네일/PDF 변환을 미리 생성
+derivative_prefetcher = DerivativePrefetcher()
+
 
 @app.on_event("startup")
 async def startup_event():
     """애플리케이션 시작 시 실행"""
     print("=== 환자 검사 통합 뷰어 API 시작 ===")
+    print(f"모듈 import 시간: {startup_metrics['import_ms']}ms")
     
-    # 데이터베이스 초기화
+    # 첫 요청에 필요한 테이블 생성만 먼저 수행
     try:
-        init_database()
+        create_tables()
+    except Exception as e:
+        print(f"❌ 데이터베이스 초기화 실패: {e}")
+    
+    # 나머지 초기화는 첫 요청을 막지 않도록 백그라운드에서 수행
+    asyncio.get_running_loop().run_in_executor(None, _deferred_startup)
+    
+    # 인덱스 변경 알림 중계 시작
+    try:
+        await event_broker.start()
+    except Exception as e:
+        print(f"❌ 변경 알림 시작 실패: {e}")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """애플리케이션 종료 시 실행"""
+    await event_broker.stop()
+    derivative_prefetcher.shutdown()
+
+
+def _deferred_startup():
+    """첫 요청 처리에 필요하지 않은 시작 작업 (디렉토리 생성, 연결 확인, 캐시 크기 집계)"""
+    try:
+        init_directories()
         if check_database_connection():
             print("✅ 데이터베이스 연결 성공")
         else:
             print("❌ 데이터베이스 연결 실패")
     except Exception as e:
         print(f"❌ 데이터베이스 초기화 실패: {e}")
+    
+    _refresh_cache_size()
+
+
+def _refresh_cache_size():
+    """캐시 디렉토리 크기를 집계합니다. (대략적)"""
+    if not _cache_size_lock.acquire(blocking=False):
+        return
+    try:
+        cache_path = "./cache"
+        if os.path.exists(cache_path):
+            total_size = 0
+            for dirpath, dirnames, filenames in os.walk(cache_path):
+                for filename in filenames:
+                    filepath = os.path.join(dirpath, filename)
+                    try:
+                        total_size += os.path.getsize(filepath)
+                    except OSError:
+                        pass
+            _cache_size["value"] = f"{total_size // 1024 // 1024}MB"
+    except Exception:
+        pass
+    finally:
+        _cache_size["updated"] = time.monotonic()
+        _cache_size_lock.release()
+
+
+async def _ensure_fingerprint(record: MedicalRecord, db: Session) -> str:
+    """
+    레코드의 내용 지문을 반환합니다.
+    지문 컬럼이 추가되기 전에 인덱싱된 레코드는 이 시점에 계산하여 저장합니다.
+    (이미지 폴더는 모든 이미지를 읽으므로 NAS 읽기가 이벤트 루프를 막지 않도록 스레드 풀에서 계산)
+    """
+    if not record.content_fingerprint:
+        record.content_fingerprint = await run_phase_in_threadpool(
+            "fingerprint", compute_fingerprint, record.file_path
+        )
+        db.commit()
+    return record.content_fingerprint
 
 
 @app.get("/")
@@ -62,26 +185,23 @@ async def health_check(db: Session = Depends(get_db)):
         # 인덱싱된 파일 수 확인
         total_files = db.query(MedicalRecord).count()
         
-        # 캐시 크기 확인 (대략적)
-        cache_size = "Unknown"
-        try:
-            cache_path = "./cache"
-            if os.path.exists(cache_path):
-                total_size = 0
-                for dirpath, dirnames, filenames in os.walk(cache_path):
-                    for filename in filenames:
-                        filepath = os.path.join(dirpath, filename)
-                        total_size += os.path.getsize(filepath)
-                cache_size = f"{total_size // 1024 // 1024}MB"
-        except Exception:
-            pass
+        # 캐시 크기 확인 (백그라운드 집계 값, 오래되었으면 갱신 예약)
+        if time.monotonic() - _cache_size["updated"] > CACHE_SIZE_REFRESH_SECONDS:
+            asyncio.get_running_loop().run_in_executor(None, _refresh_cache_size)
+        
+        if startup_metrics["first_health_ms"] is None:
+            startup_metrics["first_health_ms"] = round(
+                (time.perf_counter() - _IMPORT_STARTED) * 1000, 1
+            )
+            print(f"첫 health 응답까지: {startup_metrics['first_health_ms']}ms")
         
         return {
             "status": "healthy",
             "database": db_status,
             "watcher": "running",  # TODO: 실제 watcher 상태 확인
-            "cache_size": cache_size,
-            "indexed_files": total_files
+            "cache_size": _cache_size["value"],
+            "indexed_files": total_files,
+            "startup": startup_metrics
         }
         
     except Exception as e:
@@ -90,11 +210,13 @@ async def health_check(db: Session = Depends(get_db)):
 
 @app.get("/api/search")
 async def search_medical_records(
+    request: Request,
     q: str = Query(..., description="검색어 (환자명 또는 등록번호)"),
     limit: int = Query(50, description="결과 개수 제한"),
     offset: int = Query(0, description="페이지네이션 오프셋"),
     sort_by: str = Query("file_creation_date", description="정렬 기준"),
     sort_order: str = Query("desc", description="정렬 순서 (asc/desc)"),
+    prefetch: bool = Query(True, description="상위 결과의 썸네일/PDF 미리 생성 여부"),
     db: Session = Depends(get_db)
 ):
     """환자명 또는 등록번호로 검사 기록 검색"""
@@ -130,21 +252,70 @@ async def search_medical_records(
         # 페이지네이션 적용
         results = query.offset(offset).limit(limit).all()
         
-        # 결과를 딕셔너리로 변환
-        result_list = [record.to_dict() for record in results]
+        # 클라이언트가 곧 요청할 상위 결과의 파생물을 백그라운드에서 미리 생성
+        # (같은 클라이언트의 이전 검색에 대한 대기 작업은 취소됨)
+        if prefetch:
+            client_key = request.client.host if request.client else "unknown"
+            derivative_prefetcher.schedule(
+                client_key,
+                [
+                    PrefetchItem(record.file_path, record.file_type, record.content_fingerprint)
+                    for record in results[:PREFETCH_TOP_N]
+                ],
+                open_count=PREFETCH_OPEN_N,
+            )
         
-        return {
-            "total": total,
-            "results": result_list,
-            "query": q,
-            "limit": limit,
-            "offset": offset
-        }
+        # 결과를 딕셔너리로 변환하여 JSON으로 인코딩
+        with phase("encode"):
+            return JSONResponse(jsonable_encoder({
+                "total": total,
+                "results": [record.to_dict() for record in results],
+                "query": q,
+                "limit": limit,
+                "offset": offset
+            }))
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
 
 
+@app.get("/api/events")
+async def subscribe_record_events(
+    request: Request,
+    patient_id: Optional[str] = Query(None, description="구독할 환자 등록번호"),
+    q: Optional[str] = Query(None, description="구독할 검색어 (검색 API와 같은 규칙)"),
+):
+    """새로 인덱싱/변경/삭제된 레코드를 Server-Sent Events로 실시간 전달"""
+    last_event_id = request.headers.get("last-event-id")
+    subscription = await event_broker.subscribe(
+        patient_id=patient_id,
+        q=q,
+        last_event_id=int(last_event_id) if last_event_id and last_event_id.isdigit() else None,
+    )
+
+    async def event_stream():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(
+                        subscription.queue.get(), timeout=SSE_KEEPALIVE_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                data = json.dumps(event, ensure_ascii=False)
+                yield f"id: {event['event_id']}\nevent: {event['action']}\ndata: {data}\n\n"
+        finally:
+            event_broker.unsubscribe(subscription)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.get("/api/file/{record_id}")
 async def get_file(record_id: int, db: Session = Depends(get_db)):
     """원본 파일 스트리밍 제공"""
@@ -158,18 +329,32 @@ async def get_file(record_id: int, db: Session = Depends(get_db)):
         file_path = record.file_path
         
         # 파일 존재 확인
-        if not os.path.exists(file_path):
+        with phase("stat"):
+            file_exists = os.path.exists(file_path)
+        if not file_exists:
             raise HTTPException(status_code=404, detail="파일이 존재하지 않습니다.")
         
         # 파일 타입에 따른 처리
         if record.file_type == "DOCX":
-            # TODO: DOCX를 PDF로 변환하여 제공
-            # 현재는 원본 파일 제공
-            return FileResponse(
-                file_path,
-                filename=os.path.basename(file_path),
-                headers={"Content-Type": "application/vnd.openxmlformats-officedocument.wordprocessingml.document"}
-            )
+            # DOCX는 PDF로 변환하여 제공 (변환 결과는 내용 지문 기준으로 캐시)
+            try:
+                fingerprint = await _ensure_fingerprint(record, db)
+                pdf_path = await run_phase_in_threadpool(
+                    "render", converter.get_pdf, file_path, "DOCX", fingerprint
+                )
+                return FileResponse(
+                    pdf_path,
+                    filename=os.path.splitext(os.path.basename(file_path))[0] + ".pdf",
+                    headers={"Content-Type": "application/pdf"}
+                )
+            except Exception as e:
+                # 변환 실패 시 원본 파일 제공
+                print(f"DOCX 변환 실패: {file_path} - {e}")
+                return FileResponse(
+                    file_path,
+                    filename=os.path.basename(file_path),
+                    headers={"Content-Type": "application/vnd.openxmlformats-officedocument.wordprocessingml.document"}
+                )
         elif record.file_type == "PDF":
             return FileResponse(
                 file_path,
@@ -177,8 +362,16 @@ async def get_file(record_id: int, db: Session = Depends(get_db)):
                 headers={"Content-Type": "application/pdf"}
             )
         elif record.file_type == "IMAGE_FOLDER":
-            # TODO: 이미지 폴더를 PDF로 변환하여 제공
-            raise HTTPException(status_code=501, detail="이미지 폴더 처리가 아직 구현되지 않았습니다.")
+            # 이미지 폴더는 단일 PDF로 묶어서 제공
+            fingerprint = await _ensure_fingerprint(record, db)
+            pdf_path = await run_phase_in_threadpool(
+                "render", converter.get_pdf, file_path, "IMAGE_FOLDER", fingerprint
+            )
+            return FileResponse(
+                pdf_path,
+                filename=os.path.basename(file_path) + ".pdf",
+                headers={"Content-Type": "application/pdf"}
+            )
         else:
             # 기타 파일은 원본 제공
             return FileResponse(file_path, filename=os.path.basename(file_path))
@@ -189,6 +382,83 @@ async def get_file(record_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"File serving failed: {str(e)}")
 
 
+def _get_image_record(record_id: int, db: Session) -> MedicalRecord:
+    """미리보기/타일 요청 대상인 IMAGE 레코드를 조회합니다."""
+    record = db.query(MedicalRecord).filter(MedicalRecord.id == record_id).first()
+    
+    if not record:
+        raise HTTPException(status_code=404, detail="파일을 찾을 수 없습니다.")
+    if record.file_type != "IMAGE":
+        raise HTTPException(status_code=400, detail="이미지 파일만 지원합니다.")
+    with phase("stat"):
+        file_exists = os.path.exists(record.file_path)
+    if not file_exists:
+        raise HTTPException(status_code=404, detail="파일이 존재하지 않습니다.")
+    
+    return record
+
+
+@app.get("/api/file/{record_id}/preview")
+async def get_image_preview(
+    record_id: int,
+    width: int = Query(1024, description=f"미리보기 가로 크기 {converter.PREVIEW_WIDTHS}"),
+    db: Session = Depends(get_db)
+):
+    """대용량 이미지의 축소 미리보기 제공"""
+    if width not in converter.PREVIEW_WIDTHS:
+        raise HTTPException(status_code=400, detail=f"지원하는 가로 크기: {converter.PREVIEW_WIDTHS}")
+    
+    try:
+        record = _get_image_record(record_id, db)
+        fingerprint = await _ensure_fingerprint(record, db)
+        preview_path = await run_phase_in_threadpool(
+            "render", converter.get_preview, record.file_path, fingerprint, width
+        )
+        return FileResponse(preview_path, headers={"Content-Type": "image/jpeg"})
+        
+    except HTTPException:
+        raise
+    except converter.ImageTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Preview generation failed: {str(e)}")
+
+
+@app.get("/api/file/{record_id}/tiles")
+async def get_image_pyramid_info(record_id: int, db: Session = Depends(get_db)):
+    """타일 피라미드 정보 제공 (원본 크기, 타일 크기, 최대 레벨)"""
+    try:
+        record = _get_image_record(record_id, db)
+        fingerprint = await _ensure_fingerprint(record, db)
+        return await run_phase_in_threadpool("render", ensure_pyramid, record.file_path, fingerprint)
+        
+    except HTTPException:
+        raise
+    except converter.ImageTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Tile pyramid generation failed: {str(e)}")
+
+
+@app.get("/api/file/{record_id}/tile/{z}/{x}/{y}")
+async def get_image_tile(record_id: int, z: int, x: int, y: int, db: Session = Depends(get_db)):
+    """타일 피라미드의 타일 하나 제공 (z: 레벨, 최고 레벨이 원본 해상도)"""
+    try:
+        record = _get_image_record(record_id, db)
+        fingerprint = await _ensure_fingerprint(record, db)
+        tile_path = await run_phase_in_threadpool("render", get_tile, record.file_path, fingerprint, z, x, y)
+        return FileResponse(tile_path, headers={"Content-Type": "image/jpeg"})
+        
+    except HTTPException:
+        raise
+    except converter.ImageTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except IndexError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Tile generation failed: {str(e)}")
+
+
 @app.get("/api/thumbnail/{record_id}")
 async def get_thumbnail(record_id: int, db: Session = Depends(get_db)):
     """썸네일 이미지 제공"""
@@ -200,14 +470,28 @@ async def get_thumbnail(record_id: int, db: Session = Depends(get_db)):
             raise HTTPException(status_code=404, detail="레코드를 찾을 수 없습니다.")
         
         # 캐시된 썸네일 확인
-        if record.thumbnail_path and os.path.exists(record.thumbnail_path):
+        with phase("stat"):
+            thumbnail_cached = bool(record.thumbnail_path) and os.path.exists(record.thumbnail_path)
+            source_exists = thumbnail_cached or os.path.exists(record.file_path)
+        if thumbnail_cached:
             return FileResponse(
                 record.thumbnail_path,
                 headers={"Content-Type": "image/png"}
             )
         
-        # 썸네일이 없으면 생성
-        # TODO: 파일 타입에 따른 썸네일 생성 로직 구현
+        # 썸네일이 없으면 생성 (내용 지문 기준으로 캐시되므로 중복 파일은 재사용)
+        if source_exists:
+            try:
+                fingerprint = await _ensure_fingerprint(record, db)
+                thumbnail_path = await run_phase_in_threadpool(
+                    "render", converter.get_thumbnail, record.file_path, record.file_type, fingerprint
+                )
+                record.thumbnail_path = thumbnail_path
+                db.commit()
+                return FileResponse(thumbnail_path, headers={"Content-Type": "image/png"})
+            except Exception as e:
+                print(f"썸네일 생성 실패: {record.file_path} - {e}")
+                db.rollback()
         
         # 임시로 기본 썸네일 제공
         default_thumbnail = "./static/default_thumbnail.png"
@@ -222,6 +506,85 @@ async def get_thumbnail(record_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Thumbnail generation failed: {str(e)}")
 
 
+def _export_entries(records: List[dict]):
+    """
+    내보낼 레코드를 (원본 경로, ZIP 내부 경로) 목록으로 펼칩니다.
+    이미지 폴더는 하위 파일을 모두 포함하며, 같은 원본이 여러 번 포함되지 않도록 합니다.
+    """
+    seen_sources = set()
+    seen_names = set()
+    
+    def unique_name(arcname: str) -> str:
+        base, ext = os.path.splitext(arcname)
+        candidate, counter = arcname, 2
+        while candidate in seen_names:
+            candidate = f"{base} ({counter}){ext}"
+            counter += 1
+        seen_names.add(candidate)
+        return candidate
+    
+    for record in records:
+        folder = f"{record['patient_id']}_{record['patient_name']}"
+        file_path = record['file_path']
+        
+        if record['file_type'] == "IMAGE_FOLDER":
+            folder_name = os.path.basename(os.path.normpath(file_path))
+            for dirpath, dirnames, filenames in os.walk(file_path):
+                dirnames.sort()
+                for filename in sorted(filenames):
+                    source = os.path.join(dirpath, filename)
+                    if os.path.realpath(source) in seen_sources:
+                        continue
+                    seen_sources.add(os.path.realpath(source))
+                    relative = os.path.relpath(source, file_path).replace(os.sep, "/")
+                    yield source, unique_name(f"{folder}/{folder_name}/{relative}")
+        else:
+            if os.path.realpath(file_path) in seen_sources:
+                continue
+            seen_sources.add(os.path.realpath(file_path))
+            yield file_path, unique_name(f"{folder}/{os.path.basename(file_path)}")
+
+
+@app.get("/api/patients/{patient_id}/export")
+async def export_patient_records(patient_id: str, db: Session = Depends(get_db)):
+    """환자의 모든 검사 파일을 ZIP으로 스트리밍 (만들어지는 대로 전송)"""
+    try:
+        records = db.query(MedicalRecord).filter(
+            MedicalRecord.patient_id == patient_id
+        ).order_by(MedicalRecord.file_creation_date.asc()).all()
+        
+        if not records:
+            raise HTTPException(status_code=404, detail="해당 환자의 검사 기록이 없습니다.")
+        
+        # 스트리밍 중에는 DB 세션을 사용하지 않도록 필요한 값만 복사
+        record_list = [
+            {
+                'patient_id': record.patient_id,
+                'patient_name': record.patient_name,
+                'file_path': record.file_path,
+                'file_type': record.file_type,
+            }
+            for record in records
+        ]
+        
+        filename = f"{patient_id}_{records[0].patient_name}.zip"
+        return StreamingResponse(
+            iter_zip_stream(_export_entries(record_list)),
+            media_type="application/zip",
+            headers={
+                "Content-Disposition": (
+                    f"attachment; filename=\"{patient_id}.zip\"; "
+                    f"filename*=UTF-8''{quote(filename)}"
+                )
+            },
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Export failed: {str(e)}")
+
+
 @app.get("/api/records")
 async def list_all_records(
     limit: int = Query(100, description="결과 개수 제한"),
@@ -254,6 +617,7 @@ async def delete_record(record_id: int, db: Session = Depends(get_db)):
         if not record:
             raise HTTPException(status_code=404, detail="레코드를 찾을 수 없습니다.")
         
+        record_event(db, "deleted", record)
         db.delete(record)
         db.commit()
         
@@ -267,6 +631,8 @@ async def delete_record(record_id: int, db: Session = Depends(get_db)):
 
 
 if __name__ == "__main__":
+    import uvicorn
+
     # 개발 서버 실행
     uvicorn.run(
         "main:app",
@@ -0,0 +1,95 @@
+"""
+백엔드 시작 시간 측정 스크립트
+Electron이 백엔드를 실행하는 것과 같은 방식으로 서버 프로세스를 띄우고,
+모듈 import 시간과 첫 /api/health 응답까지의 시간을 측정합니다.
+
+사용법:
+    python measure_startup.py                 # 5회 측정 후 결과 출력
+    python measure_startup.py --runs 10 --max-ms 3000   # 기준 초과 시 종료 코드 1
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_import_ms() -> float:
+    """새 인터프리터에서 main 모듈 import 에 걸리는 시간(ms)을 측정합니다."""
+    code = (
+        "import time; t = time.perf_counter(); import main; "
+        "print((time.perf_counter() - t) * 1000)"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def measure_time_to_health_ms(timeout: float = 60.0) -> float:
+    """서버 프로세스를 실행한 시점부터 첫 /api/health 응답까지의 시간(ms)을 측정합니다."""
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}/api/health"
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f"서버 프로세스가 종료되었습니다 (코드 {process.returncode})")
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return (time.perf_counter() - started) * 1000
+            except OSError:
+                time.sleep(0.02)
+        raise TimeoutError(f"{timeout}초 안에 health 응답이 없습니다")
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="백엔드 시작 시간 측정")
+    parser.add_argument("--runs", type=int, default=5, help="측정 횟수")
+    parser.add_argument("--max-ms", type=float, default=None,
+                        help="첫 health 응답 시간(중앙값) 기준, 초과 시 종료 코드 1")
+    args = parser.parse_args()
+
+    import_ms = [measure_import_ms() for _ in range(args.runs)]
+    health_ms = [measure_time_to_health_ms() for _ in range(args.runs)]
+
+    result = {
+        "runs": args.runs,
+        "import_ms_median": round(statistics.median(import_ms), 1),
+        "import_ms_max": round(max(import_ms), 1),
+        "time_to_health_ms_median": round(statistics.median(health_ms), 1),
+        "time_to_health_ms_max": round(max(health_ms), 1),
+    }
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+    if args.max_ms is not None and result["time_to_health_ms_median"] > args.max_ms:
+        print(f"❌ 시작 시간 기준 초과: {result['time_to_health_ms_median']}ms > {args.max_ms}ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -27,6 +27,8 @@ class MedicalRecord(Base):
     file_type = Column(String(20), nullable=False, 
                       comment="파일 종류 (PDF, DOCX, IMAGE_FOLDER)")
     file_size = Column(Integer, nullable=True, comment="파일 크기 (바이트)")
+    content_fingerprint = Column(String(64), nullable=True, 
+                                comment="내용 지문 (크기 + 앞/뒤 블록 해시, 파생물 캐시 키)")
     
     # 날짜 정보
     file_creation_date = Column(DateTime, nullable=True, 
@@ -58,6 +60,7 @@ class MedicalRecord(Base):
             'file_path': self.file_path,
             'file_type': self.file_type,
             'file_size': self.file_size,
+            'content_fingerprint': self.content_fingerprint,
             'file_creation_date': self.file_creation_date.isoformat() if self.file_creation_date else None,
             'file_modified_date': self.file_modified_date.isoformat() if self.file_modified_date else None,
             'thumbnail_path': self.thumbnail_path,
@@ -67,9 +70,48 @@ class MedicalRecord(Base):
         }
 
 
+class RecordEvent(Base):
+    """인덱스 변경 이벤트 (watcher가 기록하고 API가 실시간 알림으로 전달)"""
+    
+    __tablename__ = "record_events"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    action = Column(String(20), nullable=False, 
+                   comment="변경 종류 (created, updated, deleted)")
+    record_id = Column(Integer, nullable=False, comment="대상 medical_records.id")
+    patient_name = Column(String(50), nullable=True, comment="환자명 (구독 필터용)")
+    patient_id = Column(String(20), nullable=True, comment="등록번호 (구독 필터용)")
+    file_path = Column(Text, nullable=True,
+                      comment="변경 전 파일 경로 (이동/삭제 반영용, 생성은 새 경로)")
+    payload = Column(Text, nullable=True, comment="변경 후 레코드 JSON (삭제 시 NULL)")
+    created_at = Column(DateTime, nullable=False, default=func.now(), 
+                       comment="이벤트 발생 시각")
+    
+    def __repr__(self):
+        return f"<RecordEvent(id={self.id}, action='{self.action}', record_id={self.record_id})>"
+
+
+class PendingReplay(Base):
+    """인덱스 재구축 후 아직 반영하지 않은 이전 데이터베이스의 변경 위치 (watcher가 반영 후 삭제)"""
+    
+    __tablename__ = "pending_replays"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    source_path = Column(Text, nullable=False, comment="이전 데이터베이스 파일 경로")
+    last_event_id = Column(Integer, nullable=False,
+                          comment="이미 반영한 이전 데이터베이스의 마지막 record_events.id")
+    created_at = Column(DateTime, nullable=False, default=func.now(), 
+                       comment="등록 시각")
+    
+    def __repr__(self):
+        return f"<PendingReplay(id={self.id}, source_path='{self.source_path}', last_event_id={self.last_event_id})>"
+
+
 # 인덱스 정의 (PRD에 명시된 성능 최적화를 위한 인덱스)
 Index('idx_patient_name', MedicalRecord.patient_name)
 Index('idx_patient_id', MedicalRecord.patient_id)
 Index('idx_file_creation_date', MedicalRecord.file_creation_date)
 Index('idx_composite_search', MedicalRecord.patient_name, MedicalRecord.patient_id, MedicalRecord.file_creation_date)
-Index('idx_file_type', MedicalRecord.file_type) 
\ No newline at end of file
+Index('idx_file_type', MedicalRecord.file_type)
+Index('idx_content_fingerprint', MedicalRecord.content_fingerprint)
+Index('idx_record_event_created_at', RecordEvent.created_at)
@@ -0,0 +1,252 @@
+"""
+인덱스 오프라인 재구축 스크립트
+감시 경로 전체를 새 SQLite 파일에 일괄 적재한 뒤, 실행 중인 API를 멈추지 않고 원자적으로 교체합니다.
+
+- 적재 중에는 synchronous=OFF, journal_mode=OFF로 디스크 동기화를 생략합니다.
+- 보조 인덱스는 적재가 끝난 뒤 한 번에 생성합니다. (file_path 고유 인덱스는 중복 제거에 필요하므로 유지)
+- 완료되면 database.active 포인터를 교체하며, API/watcher는 다음 요청부터 새 파일을 사용합니다.
+- 재구축 중 watcher가 이전 파일에 기록한 변경(생성/이동/삭제)은 record_events를 통해 적재 도중에
+  새 파일로 다시 반영하고, 교체 직전까지 남은 변경은 watcher가 새 파일에 처음 쓰기 전에 반영합니다.
+  (교체 후 watcher가 쓴 변경을 이전 파일의 변경이 덮어쓰지 않도록 마지막 반영은 watcher가 담당)
+
+사용법:
+    python rebuild_index.py                      # 내용 지문은 API가 처음 사용할 때 계산
+    python rebuild_index.py --with-fingerprints  # 적재 시 내용 지문도 계산 (NAS 읽기 증가)
+"""
+import argparse
+import glob
+import os
+import re
+import time
+from datetime import datetime
+from typing import Callable, Dict, Iterator, Optional
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from database import (
+    BASE_DIR,
+    activate_database,
+    create_tables,
+    get_database_path,
+    init_directories,
+)
+from events import ChangeReplayer
+from models import Base, MedicalRecord, PendingReplay
+from watcher import FileWatcher, MedicalFileHandler
+
+# 한 번에 INSERT 하는 행 수
+BATCH_SIZE = 5000
+# 교체 후 이전 파일을 삭제하기 전 대기 시간 (처리 중인 요청이 끝나도록)
+PREVIOUS_DATABASE_GRACE_SECONDS = 10
+# 교체 후 watcher가 남은 변경을 반영할 때까지 기다리는 최대 시간 (초과하면 이전 파일을 보존)
+REPLAY_WAIT_SECONDS = 60
+# 재구축이 만드는 데이터베이스 파일명 (이 형식과 기본 파일만 정리 대상)
+DATABASE_FILE_PATTERN = re.compile(r"database(-\d{14})?\.sqlite")
+
+
+def _build_row(handler: MedicalFileHandler, path: str, is_directory: bool,
+               with_fingerprints: bool) -> Optional[Dict]:
+    """파일/폴더 하나를 medical_records 행으로 변환합니다. (파싱 실패 시 None)"""
+    if is_directory:
+        parse_result = handler.parser.parse_folder_name(path)
+    else:
+        parse_result = handler.parser.parse_filename(path)
+    if not parse_result['success']:
+        return None
+
+    file_info = handler._collect_file_info(path, with_fingerprint=with_fingerprints)
+    if not file_info:
+        return None
+
+    now = datetime.now()
+    return {
+        'patient_name': parse_result['patient_name'],
+        'patient_id': parse_result['patient_id'],
+        'file_path': path,
+        'file_type': 'IMAGE_FOLDER' if is_directory else file_info['file_type'],
+        'file_size': file_info.get('file_size'),
+        'content_fingerprint': file_info.get('content_fingerprint'),
+        'file_creation_date': file_info.get('file_creation_date'),
+        'file_modified_date': file_info.get('file_modified_date'),
+        'parsing_confidence': parse_result['confidence'],
+        'created_at': now,
+        'modified_at': now,
+    }
+
+
+def iter_index_rows(watcher: FileWatcher, with_fingerprints: bool) -> Iterator[Dict]:
+    """감시 경로를 순회하며 인덱싱할 행을 생성합니다. (scan_initial_files와 같은 순서)"""
+    for watch_path in watcher.watch_paths:
+        if not os.path.exists(watch_path):
+            print(f"경로가 존재하지 않습니다: {watch_path}")
+            continue
+        for root, dirs, files in os.walk(watch_path):
+            for dir_name in dirs:
+                row = _build_row(watcher.handler, os.path.join(root, dir_name), True, with_fingerprints)
+                if row:
+                    yield row
+            for file_name in files:
+                row = _build_row(watcher.handler, os.path.join(root, file_name), False, with_fingerprints)
+                if row:
+                    yield row
+
+
+def build_database(database_path: str, rows: Iterator[Dict],
+                   on_batch: Optional[Callable[[Connection], None]] = None) -> int:
+    """
+    새 데이터베이스 파일에 행을 일괄 적재하고, 적재 후 보조 인덱스를 생성합니다.
+    on_batch는 배치를 커밋할 때마다 같은 연결로 호출됩니다. (재구축 중 변경 반영)
+    """
+    bulk_engine = create_engine(f"sqlite:///{database_path}")
+    inserted = 0
+    try:
+        with bulk_engine.connect() as connection:
+            connection.exec_driver_sql("PRAGMA synchronous=OFF")
+            connection.exec_driver_sql("PRAGMA journal_mode=OFF")
+            connection.exec_driver_sql("PRAGMA cache_size=-200000")
+
+            # 테이블만 먼저 생성 (보조 인덱스는 적재 후 생성)
+            for table in Base.metadata.sorted_tables:
+                connection.execute(CreateTable(table))
+            connection.commit()
+
+            statement = insert(MedicalRecord.__table__).prefix_with("OR IGNORE")
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= BATCH_SIZE:
+                    inserted += connection.execute(statement, batch).rowcount
+                    connection.commit()
+                    batch = []
+                    print(f"  적재: {inserted}건")
+                    if on_batch:
+                        on_batch(connection)
+            if batch:
+                inserted += connection.execute(statement, batch).rowcount
+                connection.commit()
+            if on_batch:
+                on_batch(connection)
+
+            print("보조 인덱스 생성 중...")
+            for table in Base.metadata.sorted_tables:
+                for index in table.indexes:
+                    connection.execute(CreateIndex(index))
+            connection.exec_driver_sql("ANALYZE")
+            connection.commit()
+    finally:
+        bulk_engine.dispose()
+
+    # synchronous=OFF로 적재했으므로 교체 전에 디스크에 확실히 기록합니다.
+    with open(database_path, 'rb+') as f:
+        os.fsync(f.fileno())
+    return inserted
+
+
+def replay_batch(replayer: ChangeReplayer) -> Callable[[Connection], None]:
+    """build_database의 배치마다 재구축 중 변경을 반영하는 콜백"""
+    def replay(connection: Connection):
+        with Session(bind=connection) as db:
+            replayer.apply(db)
+            db.commit()
+    return replay
+
+
+def register_pending_replay(database_path: str, replayer: ChangeReplayer):
+    """적재 후 남은 변경의 위치를 새 데이터베이스에 기록합니다. (교체 후 watcher가 반영)"""
+    engine = create_engine(f"sqlite:///{database_path}")
+    try:
+        with Session(engine) as db:
+            db.add(PendingReplay(
+                source_path=os.path.abspath(replayer.source_path),
+                last_event_id=replayer.last_event_id,
+            ))
+            db.commit()
+    finally:
+        engine.dispose()
+
+
+def _wait_for_replay(database_path: str, timeout: float) -> bool:
+    """watcher가 남은 변경을 반영할 때까지 기다립니다. (반영되면 True)"""
+    engine = create_engine(f"sqlite:///{database_path}", connect_args={"timeout": 30})
+    deadline = time.monotonic() + timeout
+    try:
+        while True:
+            with Session(engine) as db:
+                if db.query(PendingReplay.id).first() is None:
+                    return True
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(1)
+    finally:
+        engine.dispose()
+
+
+def _remove_stale_databases(keep: set):
+    """사용하지 않는 이전 재구축 파일을 정리합니다. (아직 열려 있으면 다음 재구축 때 다시 시도)"""
+    for path in glob.glob(os.path.join(BASE_DIR, "database*.sqlite")):
+        if not DATABASE_FILE_PATTERN.fullmatch(os.path.basename(path)):
+            continue
+        if os.path.abspath(path) in keep:
+            continue
+        try:
+            os.remove(path)
+            print(f"이전 데이터베이스 삭제: {path}")
+        except OSError as e:
+            print(f"이전 데이터베이스를 삭제하지 못했습니다 (다음 재구축 때 다시 시도): {path} - {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="인덱스 오프라인 재구축")
+    parser.add_argument("--config", default="../config/nas_paths.json", help="감시 경로 설정 파일")
+    parser.add_argument("--with-fingerprints", action="store_true", help="적재 시 내용 지문 계산")
+    parser.add_argument("--keep-previous", action="store_true", help="이전 데이터베이스 파일 보존")
+    args = parser.parse_args()
+
+    print("=== 인덱스 오프라인 재구축 ===")
+    init_directories()
+
+    watcher = FileWatcher(config_path=args.config)
+    watcher.load_config()
+
+    # 현재 데이터베이스의 스키마를 보완하고 (record_events.file_path), 이후 변경을 추적할 기준을 잡습니다.
+    create_tables()
+    previous_path = os.path.abspath(get_database_path())
+    replayer = ChangeReplayer(previous_path)
+
+    started = time.monotonic()
+    new_path = os.path.join(BASE_DIR, f"database-{datetime.now():%Y%m%d%H%M%S}.sqlite")
+    print(f"새 데이터베이스 적재: {new_path}")
+    try:
+        inserted = build_database(
+            new_path, iter_index_rows(watcher, args.with_fingerprints), on_batch=replay_batch(replayer)
+        )
+        register_pending_replay(new_path, replayer)
+    except BaseException:
+        if os.path.exists(new_path):
+            os.remove(new_path)
+        raise
+    finally:
+        replayer.dispose()
+    print(f"적재 완료: {inserted}건 ({time.monotonic() - started:.1f}초, 적재 중 변경 반영 {replayer.replayed}건)")
+
+    activate_database(new_path)
+    print(f"데이터베이스 교체 완료: {previous_path} -> {new_path}")
+
+    keep = {os.path.abspath(new_path)}
+    if _wait_for_replay(new_path, REPLAY_WAIT_SECONDS):
+        print("교체 전 남은 변경을 watcher가 반영했습니다.")
+    else:
+        # watcher가 실행 중이 아니면 다음에 시작할 때 반영하므로 이전 파일을 남겨 둡니다.
+        print(f"watcher가 아직 남은 변경을 반영하지 않았습니다. 이전 파일을 보존합니다: {previous_path}")
+        keep.add(previous_path)
+
+    if not args.keep_previous:
+        time.sleep(PREVIOUS_DATABASE_GRACE_SECONDS)
+        _remove_stale_databases(keep=keep)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+테스트 공통 설정
+실제 데이터베이스(backend/database.sqlite)와 로그 대신 테스트마다 임시 디렉토리를 사용합니다.
+"""
+import pytest
+
+import database
+from database import create_tables, get_db_session, refresh_active_database
+
+
+@pytest.fixture
+def temp_database(tmp_path, monkeypatch):
+    """임시 SQLite 파일로 전환하고 테이블을 생성합니다."""
+    monkeypatch.setattr(database, "DATABASE_PATH", str(tmp_path / "database.sqlite"))
+    monkeypatch.setattr(database, "ACTIVE_DATABASE_POINTER", str(tmp_path / "database.active"))
+    refresh_active_database(force=True)
+    create_tables()
+    yield
+    database.engine.dispose()
+
+
+@pytest.fixture
+def db_session(temp_database):
+    db = get_db_session()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """watcher 로거가 logs/watcher.log를 열 수 있도록 임시 작업 디렉토리로 이동합니다."""
+    (tmp_path / "logs").mkdir(exist_ok=True)
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    """파생물 캐시를 임시 디렉토리로 바꿉니다."""
+    from utils import cache
+
+    root = tmp_path / "cache"
+    for name, sub in [("THUMBNAIL_DIR", "thumbnails"), ("CONVERTED_DIR", "converted"),
+                      ("PREVIEW_DIR", "previews"), ("TILE_DIR", "tiles")]:
+        (root / sub).mkdir(parents=True)
+        monkeypatch.setattr(cache, name, str(root / sub))
+    return root
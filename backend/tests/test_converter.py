@@ -0,0 +1,45 @@
+"""이미지 변환 테스트 (16비트/부동소수 의료 영상)"""
+import pytest
+from PIL import Image
+
+from utils.converter import HIGH_BIT_MODES, render_image_preview, render_image_thumbnail, to_8bit
+
+
+def _gradient(mode, size):
+    """왼쪽 0에서 오른쪽 최대값까지 밝아지는 high-bit 이미지"""
+    width, height = size
+    img = Image.new("I", size)
+    img.putdata([x * 4000 // max(width - 1, 1) for _ in range(height) for x in range(width)])
+    return img.convert(mode) if mode != "I" else img
+
+
+@pytest.mark.parametrize("mode", HIGH_BIT_MODES)
+def test_to_8bit_stretches_high_bit_modes(mode):
+    img = _gradient(mode, (64, 8))
+    assert img.mode == mode
+
+    result = to_8bit(img)
+
+    assert result.mode == "L"
+    assert result.getextrema() == (0, 255)
+    assert result.getpixel((0, 0)) < result.getpixel((32, 0)) < result.getpixel((63, 0))
+
+
+@pytest.mark.parametrize("mode", HIGH_BIT_MODES)
+@pytest.mark.parametrize("size", [(3000, 2000), (200, 100)])
+def test_thumbnail_and_preview_from_high_bit_tiff(tmp_path, mode, size):
+    source = tmp_path / "scan.tiff"
+    _gradient(mode, size).save(source)
+    with Image.open(source) as saved:
+        # 리틀 엔디언 16비트 TIFF는 I;16으로 열립니다.
+        assert saved.mode == ("I;16" if mode == "I;16L" else mode)
+
+    render_image_thumbnail(str(source), str(tmp_path / "thumbnail.png"))
+    render_image_preview(str(source), str(tmp_path / "preview.jpg"), 512)
+
+    with Image.open(tmp_path / "thumbnail.png") as thumbnail:
+        assert thumbnail.mode == "RGB"
+        assert thumbnail.width <= 300
+        assert thumbnail.getextrema()[0][1] > 200
+    with Image.open(tmp_path / "preview.jpg") as preview:
+        assert preview.width <= 512
@@ -0,0 +1,98 @@
+"""디렉토리 mtime 폴링 감시자 테스트"""
+import os
+
+import pytest
+from watchdog.events import FileSystemEventHandler
+
+from utils.dir_poller import MtimePollingObserver
+
+
+class RecordingHandler(FileSystemEventHandler):
+    def __init__(self):
+        self.events = []
+
+    def dispatch(self, event):
+        self.events.append((event.event_type, event.is_directory, event.src_path,
+                            getattr(event, 'dest_path', '') or None))
+
+
+def _advance_mtime(path):
+    """파일시스템 시각 해상도와 무관하게 변경이 감지되도록 수정시각을 1초 뒤로 옮깁니다."""
+    mtime = os.stat(path).st_mtime_ns + 1_000_000_000
+    os.utime(path, ns=(mtime, mtime))
+
+
+@pytest.fixture
+def watched(tmp_path):
+    root = tmp_path / "nas"
+    (root / "홍길동_12345678").mkdir(parents=True)
+    (root / "홍길동_12345678" / "혈액검사.pdf").write_bytes(b"%PDF-1.4")
+    (root / "김영희_87654321").mkdir()
+
+    observer = MtimePollingObserver(str(tmp_path / "snapshots"), interval=0.1)
+    handler = RecordingHandler()
+    observer.schedule(handler, str(root))
+    _, snapshot = observer._watches[0]
+    os.makedirs(observer.snapshot_dir, exist_ok=True)
+    assert not snapshot.open()
+    observer._build_baseline(snapshot)
+    snapshot.mark_complete()
+
+    def poll():
+        handler.events.clear()
+        observer._poll(snapshot, handler)
+        snapshot.commit()
+        return handler.events
+
+    yield root, poll
+    snapshot.close()
+
+
+def test_detects_created_file_and_folder(watched):
+    root, poll = watched
+    (root / "홍길동_12345678" / "소변검사.pdf").write_bytes(b"%PDF-1.4")
+    _advance_mtime(root / "홍길동_12345678")
+    (root / "이순신_11112222" / "영상").mkdir(parents=True)
+    (root / "이순신_11112222" / "영상" / "흉부.png").write_bytes(b"png")
+    _advance_mtime(root)
+
+    events = poll()
+
+    assert ("created", False, str(root / "홍길동_12345678" / "소변검사.pdf"), None) in events
+    assert ("created", True, str(root / "이순신_11112222"), None) in events
+    assert ("created", True, str(root / "이순신_11112222" / "영상"), None) in events
+    assert ("created", False, str(root / "이순신_11112222" / "영상" / "흉부.png"), None) in events
+    assert poll() == []
+
+
+def test_detects_folder_move_as_single_event(watched):
+    root, poll = watched
+    os.rename(root / "홍길동_12345678", root / "김영희_87654321" / "홍길동_12345678")
+    _advance_mtime(root)
+    _advance_mtime(root / "김영희_87654321")
+
+    events = poll()
+
+    assert events == [("moved", True, str(root / "홍길동_12345678"),
+                       str(root / "김영희_87654321" / "홍길동_12345678"))]
+
+    # 이동한 폴더 아래의 변경도 이후 패스에서 감지됩니다.
+    moved = root / "김영희_87654321" / "홍길동_12345678"
+    (moved / "혈액검사.pdf").unlink()
+    _advance_mtime(moved)
+    assert poll() == [("deleted", False, str(moved / "혈액검사.pdf"), None)]
+
+
+def test_detects_deleted_folder_and_in_place_edit(watched):
+    root, poll = watched
+    report = root / "홍길동_12345678" / "혈액검사.pdf"
+    report.write_bytes(b"%PDF-1.4 updated")
+    _advance_mtime(report)
+    (root / "김영희_87654321").rmdir()
+    _advance_mtime(root)
+
+    events = poll()
+
+    assert ("deleted", True, str(root / "김영희_87654321"), None) in events
+    assert ("modified", False, str(report), None) in events
+    assert len(events) == 2
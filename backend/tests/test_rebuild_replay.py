@@ -0,0 +1,99 @@
+"""인덱스 재구축 중 변경 반영 테스트"""
+import os
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, select
+
+import database
+from database import activate_database, get_database_path
+from events import ChangeReplayer
+from models import MedicalRecord, PendingReplay, RecordEvent
+from rebuild_index import build_database, register_pending_replay, replay_batch
+from watcher import MedicalFileHandler
+
+NAS = os.path.join(os.sep, "nas")
+
+
+@pytest.fixture
+def handler(workdir, temp_database):
+    handler = MedicalFileHandler()
+    # 현재 데이터베이스를 사용 중으로 기록 (재구축 전 상태)
+    handler.check_database_switch()
+    return handler
+
+
+def _save(handler, name):
+    handler._save_to_database({
+        'patient_name': "홍길동", 'patient_id': "12345678",
+        'file_path': os.path.join(NAS, name), 'file_type': "PDF",
+    })
+
+
+def _row(name):
+    now = datetime.now()
+    return {
+        'patient_name': "홍길동", 'patient_id': "12345678",
+        'file_path': os.path.join(NAS, name), 'file_type': "PDF",
+        'created_at': now, 'modified_at': now,
+    }
+
+
+def _paths(database_path):
+    engine = create_engine(f"sqlite:///{database_path}")
+    try:
+        with engine.connect() as connection:
+            return sorted(connection.execute(select(MedicalRecord.file_path)).scalars())
+    finally:
+        engine.dispose()
+
+
+def test_replays_create_move_and_delete_made_during_load(handler, tmp_path):
+    for name in ["유지.pdf", "이동전.pdf", "삭제.pdf"]:
+        _save(handler, name)
+    replayer = ChangeReplayer(get_database_path())
+
+    # 적재 중 watcher가 이전 데이터베이스에 기록한 변경
+    _save(handler, "신규.pdf")
+    handler._update_file_path(os.path.join(NAS, "이동전.pdf"), os.path.join(NAS, "이동후.pdf"))
+    handler._remove_from_database(os.path.join(NAS, "삭제.pdf"))
+
+    # 적재 시점에 따라 새 데이터베이스에는 변경 전/후 상태가 섞여 있을 수 있음
+    new_path = str(tmp_path / "database-20260101000000.sqlite")
+    rows = [_row(name) for name in ["유지.pdf", "이동전.pdf", "이동후.pdf", "삭제.pdf", "유지.pdf"]]
+    try:
+        inserted = build_database(new_path, iter(rows), on_batch=replay_batch(replayer))
+    finally:
+        replayer.dispose()
+
+    assert inserted == 4
+    assert replayer.replayed == 3
+    assert _paths(new_path) == sorted(
+        os.path.join(NAS, name) for name in ["유지.pdf", "신규.pdf", "이동후.pdf"]
+    )
+
+
+def test_watcher_replays_before_writing_to_switched_database(handler, tmp_path, db_session):
+    replayer = ChangeReplayer(get_database_path())
+    new_path = str(tmp_path / "database-20260101000000.sqlite")
+    try:
+        build_database(new_path, iter([_row("유지.pdf")]), on_batch=replay_batch(replayer))
+        # 마지막 배치 반영 이후, 교체 전에 생성된 파일
+        _save(handler, "교체직전.pdf")
+        register_pending_replay(new_path, replayer)
+    finally:
+        replayer.dispose()
+
+    activate_database(new_path)
+    # 교체 후 같은 파일이 삭제됨: 남은 변경(생성)이 먼저 반영된 뒤 삭제되어야 함
+    handler._remove_from_database(os.path.join(NAS, "교체직전.pdf"))
+
+    assert os.path.samefile(get_database_path(), new_path)
+    assert _paths(new_path) == [os.path.join(NAS, "유지.pdf")]
+    db = database.get_db_session()
+    try:
+        assert db.query(PendingReplay).count() == 0
+        actions = [event.action for event in db.query(RecordEvent).order_by(RecordEvent.id)]
+        assert actions == ["created", "deleted"]
+    finally:
+        db.close()
@@ -0,0 +1,109 @@
+"""watcher 폴더 이동 처리 테스트 (하위 레코드 경로 일괄 변경)"""
+import os
+
+import pytest
+from watchdog.events import DirDeletedEvent, DirMovedEvent, FileDeletedEvent
+
+from models import MedicalRecord, RecordEvent
+from watcher import MedicalFileHandler
+
+
+@pytest.fixture
+def handler(workdir, temp_database):
+    return MedicalFileHandler()
+
+
+def _add_records(db, paths):
+    for path in paths:
+        db.add(MedicalRecord(
+            patient_name="홍길동", patient_id="12345678",
+            file_path=path, file_type="PDF",
+        ))
+    db.commit()
+
+
+def _paths(db):
+    return sorted(path for (path,) in db.query(MedicalRecord.file_path))
+
+
+def test_folder_rename_keeps_sibling_with_same_prefix(handler, db_session):
+    root = os.path.join(os.sep, "nas", "검사결과")
+    folder = os.path.join(root, "홍길동_12345678")
+    sibling = os.path.join(root, "홍길동_12345678 추가")
+    renamed = os.path.join(root, "홍길동_12345678_2024")
+    _add_records(db_session, [
+        folder,
+        os.path.join(folder, "혈액검사.pdf"),
+        os.path.join(folder, "영상", "흉부.pdf"),
+        os.path.join(sibling, "소변검사.pdf"),
+    ])
+
+    handler._update_file_path(folder, renamed)
+
+    db_session.expire_all()
+    assert _paths(db_session) == sorted([
+        renamed,
+        os.path.join(renamed, "혈액검사.pdf"),
+        os.path.join(renamed, "영상", "흉부.pdf"),
+        os.path.join(sibling, "소변검사.pdf"),
+    ])
+    events = db_session.query(RecordEvent).filter(RecordEvent.action == "updated").all()
+    assert sorted(event.file_path for event in events) == sorted([
+        folder,
+        os.path.join(folder, "혈액검사.pdf"),
+        os.path.join(folder, "영상", "흉부.pdf"),
+    ])
+
+
+def test_folder_move_replaces_stale_rows_at_destination(handler, db_session):
+    source = os.path.join(os.sep, "nas", "신규", "김영희_87654321")
+    destination = os.path.join(os.sep, "nas", "보관", "김영희_87654321")
+    _add_records(db_session, [
+        os.path.join(source, "초음파.pdf"),
+        os.path.join(destination, "초음파.pdf"),
+        os.path.join(destination, "삭제된파일.pdf"),
+    ])
+    stale_ids = {
+        record_id for (record_id,) in db_session.query(MedicalRecord.id)
+        .filter(MedicalRecord.file_path.like(destination + "%"))
+    }
+
+    handler._update_file_path(source, destination)
+
+    db_session.expire_all()
+    assert _paths(db_session) == [os.path.join(destination, "초음파.pdf")]
+    deleted = {
+        event.record_id for event in
+        db_session.query(RecordEvent).filter(RecordEvent.action == "deleted")
+    }
+    assert deleted == stale_ids
+
+
+def test_events_under_folder_moved_back_are_not_skipped(handler, db_session):
+    folder_a = os.path.join(os.sep, "nas", "홍길동_12345678")
+    folder_b = os.path.join(os.sep, "nas", "홍길동_12345678_임시")
+    report = os.path.join(folder_a, "혈액검사.pdf")
+    _add_records(db_session, [report])
+
+    handler.on_moved(DirMovedEvent(folder_a, folder_b))
+    handler.on_moved(DirMovedEvent(folder_b, folder_a))
+    handler.on_deleted(FileDeletedEvent(report))
+
+    db_session.expire_all()
+    assert _paths(db_session) == []
+
+
+def test_events_under_folder_moved_onto_deleted_folder_are_not_skipped(handler, db_session):
+    deleted = os.path.join(os.sep, "nas", "김영희_87654321")
+    incoming = os.path.join(os.sep, "nas", "신규", "김영희_87654321")
+    _add_records(db_session, [
+        os.path.join(deleted, "초음파.pdf"),
+        os.path.join(incoming, "심전도.pdf"),
+    ])
+
+    handler.on_deleted(DirDeletedEvent(deleted))
+    handler.on_moved(DirMovedEvent(incoming, deleted))
+    handler.on_deleted(FileDeletedEvent(os.path.join(deleted, "심전도.pdf")))
+
+    db_session.expire_all()
+    assert _paths(db_session) == []
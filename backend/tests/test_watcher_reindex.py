@@ -0,0 +1,125 @@
+"""watcher 수정 파일 재색인 테스트"""
+import os
+import time
+from datetime import datetime
+
+import pytest
+
+import watcher
+from models import MedicalRecord, RecordEvent
+from utils.cache import compute_fingerprint, thumbnail_cache_path
+from watcher import MedicalFileHandler
+
+
+@pytest.fixture
+def handler(workdir, temp_database, cache_dir):
+    return MedicalFileHandler()
+
+
+@pytest.fixture
+def report(tmp_path, db_session):
+    """인덱싱된 보고서와 그 썸네일 파생물"""
+    path = tmp_path / "홍길동_12345678_혈액검사.pdf"
+    path.write_bytes(b"%PDF-1.4 original")
+    fingerprint = compute_fingerprint(str(path))
+    thumbnail = thumbnail_cache_path(fingerprint)
+    with open(thumbnail, 'wb') as f:
+        f.write(b"png")
+
+    stat = os.stat(path)
+    record = MedicalRecord(
+        patient_name="홍길동", patient_id="12345678", file_path=str(path), file_type="PDF",
+        file_size=stat.st_size, file_modified_date=datetime.fromtimestamp(stat.st_mtime),
+        content_fingerprint=fingerprint, thumbnail_path=thumbnail,
+    )
+    db_session.add(record)
+    db_session.commit()
+    return path, record, thumbnail
+
+
+def _set_mtime(path, offset_seconds):
+    mtime = os.stat(path).st_mtime_ns + offset_seconds * 1_000_000_000
+    os.utime(path, ns=(mtime, mtime))
+
+
+def _events(db):
+    return [(event.action, event.record_id) for event in db.query(RecordEvent)]
+
+
+def test_unchanged_size_and_mtime_is_skipped(handler, report, db_session):
+    path, record, thumbnail = report
+
+    handler._reindex_modified(str(path))
+
+    db_session.expire_all()
+    assert _events(db_session) == []
+    assert record.thumbnail_path == thumbnail
+    assert os.path.exists(thumbnail)
+
+
+def test_touch_without_content_change_updates_metadata_only(handler, report, db_session):
+    path, record, thumbnail = report
+    fingerprint = record.content_fingerprint
+    _set_mtime(path, 60)
+
+    handler._reindex_modified(str(path))
+
+    db_session.expire_all()
+    assert _events(db_session) == []
+    assert record.file_modified_date == datetime.fromtimestamp(os.stat(path).st_mtime)
+    assert record.content_fingerprint == fingerprint
+    assert record.thumbnail_path == thumbnail
+    assert os.path.exists(thumbnail)
+
+
+def test_content_edit_clears_thumbnail_and_removes_old_derivative(handler, report, db_session):
+    path, record, thumbnail = report
+    old_fingerprint = record.content_fingerprint
+    path.write_bytes(b"%PDF-1.4 edited report")
+    _set_mtime(path, 60)
+
+    handler._reindex_modified(str(path))
+
+    db_session.expire_all()
+    assert _events(db_session) == [("updated", record.id)]
+    assert record.content_fingerprint == compute_fingerprint(str(path)) != old_fingerprint
+    assert record.file_size == os.path.getsize(path)
+    assert record.thumbnail_path is None
+    assert not os.path.exists(thumbnail)
+
+
+def test_derivative_shared_with_another_record_is_kept(handler, report, db_session, tmp_path):
+    path, record, thumbnail = report
+    copy = tmp_path / "홍길동_12345678_혈액검사_사본.pdf"
+    copy.write_bytes(b"%PDF-1.4 original")
+    db_session.add(MedicalRecord(
+        patient_name="홍길동", patient_id="12345678", file_path=str(copy), file_type="PDF",
+        content_fingerprint=record.content_fingerprint, thumbnail_path=thumbnail,
+    ))
+    db_session.commit()
+    path.write_bytes(b"%PDF-1.4 edited report")
+    _set_mtime(path, 60)
+
+    handler._reindex_modified(str(path))
+
+    db_session.expire_all()
+    assert _events(db_session) == [("updated", record.id)]
+    assert record.thumbnail_path is None
+    assert os.path.exists(thumbnail)
+
+
+def test_repeated_modify_events_are_debounced(handler, monkeypatch):
+    monkeypatch.setattr(watcher, "MODIFY_DEBOUNCE_SECONDS", 0.3)
+    monkeypatch.setattr(watcher, "REINDEX_CHECK_INTERVAL", 0.05)
+    calls = []
+    monkeypatch.setattr(handler, "_reindex_modified", calls.append)
+
+    for _ in range(5):
+        handler._schedule_reindex("/nas/홍길동_12345678_혈액검사.pdf")
+        time.sleep(0.1)
+    assert calls == []
+
+    deadline = time.monotonic() + 3
+    while handler._reindex_thread is not None and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert calls == ["/nas/홍길동_12345678_혈액검사.pdf"]
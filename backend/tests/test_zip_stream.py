@@ -0,0 +1,35 @@
+"""ZIP 스트리밍 테스트"""
+import io
+import os
+import zipfile
+
+from utils import zip_stream
+from utils.zip_stream import iter_zip_stream
+
+
+def test_streamed_zip_is_valid_with_stored_and_deflated_entries(tmp_path, monkeypatch):
+    # 여러 조각으로 나뉘어 기록되도록 읽기 단위를 줄입니다.
+    monkeypatch.setattr(zip_stream, "ZIP_CHUNK_SIZE", 1000)
+    contents = {
+        "홍길동_12345678/검사결과.pdf": b"%PDF-1.4\n" + os.urandom(5000),
+        "홍길동_12345678/영상/흉부.png": os.urandom(3000),
+        "홍길동_12345678/메모.txt": "소견 없음\n".encode("utf-8") * 500,
+    }
+    entries = []
+    for index, (arcname, data) in enumerate(contents.items()):
+        source = tmp_path / f"source{index}"
+        source.write_bytes(data)
+        entries.append((str(source), arcname))
+    entries.append((str(tmp_path / "missing.pdf"), "홍길동_12345678/없는파일.pdf"))
+
+    archive = io.BytesIO(b"".join(iter_zip_stream(entries)))
+
+    with zipfile.ZipFile(archive) as zf:
+        assert zf.testzip() is None
+        assert sorted(zf.namelist()) == sorted(contents)
+        compress_types = {info.filename: info.compress_type for info in zf.infolist()}
+        assert compress_types["홍길동_12345678/검사결과.pdf"] == zipfile.ZIP_STORED
+        assert compress_types["홍길동_12345678/영상/흉부.png"] == zipfile.ZIP_STORED
+        assert compress_types["홍길동_12345678/메모.txt"] == zipfile.ZIP_DEFLATED
+        for arcname, data in contents.items():
+            assert zf.read(arcname) == data
@@ -0,0 +1,144 @@
+"""
+캐시 관리 유틸리티
+파일 내용 지문(fingerprint)을 계산하고, 지문을 키로 하는 파생물(썸네일, 변환 PDF) 캐시 경로를 관리합니다.
+
+같은 보고서가 여러 NAS 폴더에 복사되어 있어도 지문이 같으므로 파생물은 한 번만 생성되며,
+파일이 이동하거나 이름이 바뀌어도 다시 렌더링할 필요가 없습니다.
+"""
+import glob
+import hashlib
+import os
+import shutil
+import threading
+from typing import List
+
+from utils.file_parser import IMAGE_EXTENSIONS
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.path.join(BACKEND_DIR, "cache")
+THUMBNAIL_DIR = os.path.join(CACHE_DIR, "thumbnails")
+CONVERTED_DIR = os.path.join(CACHE_DIR, "converted")
+PREVIEW_DIR = os.path.join(CACHE_DIR, "previews")
+TILE_DIR = os.path.join(CACHE_DIR, "tiles")
+
+# 지문 계산 시 읽는 앞/뒤 블록 크기
+FINGERPRINT_BLOCK_SIZE = 64 * 1024
+
+# 이미지 폴더 지문 접두어 (16진수가 아니므로 파일 지문의 크기 부분과 겹치지 않음)
+FOLDER_FINGERPRINT_PREFIX = "dir-"
+
+# 같은 파생물을 동시에 생성하지 않도록 키별로 잠그는 락 (고정 개수로 분산)
+_KEY_LOCKS = [threading.Lock() for _ in range(64)]
+
+
+def list_image_files(folder_path: str) -> List[str]:
+    """폴더 바로 아래의 이미지 파일 경로를 이름순으로 반환합니다."""
+    names = sorted(
+        name for name in os.listdir(folder_path)
+        if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+    )
+    return [os.path.join(folder_path, name) for name in names]
+
+
+def _hash_blocks(digest, file_path: str, size: int):
+    """파일의 앞/뒤 블록(최대 128KB)을 digest에 추가합니다."""
+    with open(file_path, 'rb') as f:
+        digest.update(f.read(FINGERPRINT_BLOCK_SIZE))
+        if size > FINGERPRINT_BLOCK_SIZE:
+            f.seek(max(FINGERPRINT_BLOCK_SIZE, size - FINGERPRINT_BLOCK_SIZE))
+            digest.update(f.read(FINGERPRINT_BLOCK_SIZE))
+
+
+def compute_fingerprint(file_path: str) -> str:
+    """
+    파일 내용 지문을 계산합니다.
+    파일 크기와 앞/뒤 블록의 해시만 사용하므로 대용량 파일도 최대 128KB만 읽습니다.
+
+    Returns:
+        str: "{크기(16진수)}-{해시}" 형식의 지문 (폴더는 "dir-{해시}")
+    """
+    if os.path.isdir(file_path):
+        return compute_folder_fingerprint(file_path)
+
+    size = os.path.getsize(file_path)
+    digest = hashlib.blake2b(digest_size=16)
+    _hash_blocks(digest, file_path, size)
+    return f"{size:x}-{digest.hexdigest()}"
+
+
+def compute_folder_fingerprint(folder_path: str) -> str:
+    """
+    이미지 폴더의 지문을 계산합니다.
+    이미지마다 파일명, 크기, 앞/뒤 블록 내용을 반영하므로 파일명과 크기가 같은 규격 영상
+    (IM0001... 등)이라도 내용이 다르면 지문이 달라집니다.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for image_path in list_image_files(folder_path):
+        size = os.path.getsize(image_path)
+        digest.update(os.path.basename(image_path).encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(str(size).encode('ascii'))
+        digest.update(b'\0')
+        _hash_blocks(digest, image_path, size)
+        digest.update(b'\n')
+
+    return f"{FOLDER_FINGERPRINT_PREFIX}{digest.hexdigest()}"
+
+
+def thumbnail_cache_path(fingerprint: str) -> str:
+    """지문에 해당하는 썸네일 캐시 경로"""
+    return os.path.join(THUMBNAIL_DIR, f"{fingerprint}.png")
+
+
+def converted_cache_path(fingerprint: str) -> str:
+    """지문에 해당하는 변환 PDF 캐시 경로"""
+    return os.path.join(CONVERTED_DIR, f"{fingerprint}.pdf")
+
+
+def preview_cache_path(fingerprint: str, width: int) -> str:
+    """지문과 가로 크기에 해당하는 미리보기 이미지 캐시 경로"""
+    return os.path.join(PREVIEW_DIR, f"{fingerprint}_{width}.jpg")
+
+
+def tile_cache_dir(fingerprint: str) -> str:
+    """지문에 해당하는 타일 피라미드 캐시 디렉토리"""
+    return os.path.join(TILE_DIR, fingerprint)
+
+
+def remove_derivatives(fingerprint: str) -> int:
+    """
+    지문에 해당하는 파생물(썸네일, 변환 PDF, 미리보기, 타일)을 모두 삭제합니다.
+    내용이 바뀌어 더 이상 참조되지 않는 지문을 정리할 때 사용합니다.
+
+    Returns:
+        int: 삭제한 캐시 항목 수
+    """
+    removed = 0
+    paths = [thumbnail_cache_path(fingerprint), converted_cache_path(fingerprint)]
+    paths += glob.glob(os.path.join(PREVIEW_DIR, f"{glob.escape(fingerprint)}_*.jpg"))
+    for path in paths:
+        try:
+            os.remove(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+
+    pyramid_dir = tile_cache_dir(fingerprint)
+    if os.path.isdir(pyramid_dir):
+        shutil.rmtree(pyramid_dir, ignore_errors=True)
+        removed += 1
+    return removed
+
+
+def temp_path_for(target_path: str) -> str:
+    """
+    원자적 교체(os.replace)를 위한 임시 파일 경로를 반환합니다.
+    확장자는 유지하므로 확장자로 형식을 판단하는 라이브러리에도 그대로 전달할 수 있습니다.
+    """
+    base, ext = os.path.splitext(target_path)
+    return f"{base}.{os.getpid()}-{threading.get_ident()}.tmp{ext}"
+
+
+def key_lock(key: str) -> threading.Lock:
+    """캐시 키에 대응하는 락을 반환합니다."""
+    return _KEY_LOCKS[hash(key) % len(_KEY_LOCKS)]
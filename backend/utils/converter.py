@@ -0,0 +1,306 @@
+"""
+파일 변환 유틸리티
+썸네일 생성과 PDF 변환(DOCX, 이미지 폴더)을 담당합니다.
+
+모든 파생물은 원본의 내용 지문(fingerprint)을 키로 캐시되므로,
+중복 복사본이나 이동/이름변경된 파일은 기존 결과를 그대로 재사용합니다.
+
+렌더링 라이브러리(fitz, Pillow, reportlab, docx2pdf)는 무겁기 때문에
+서버 시작 시간을 줄이기 위해 실제로 사용하는 함수 안에서 import 합니다.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from utils.cache import (
+    converted_cache_path,
+    key_lock,
+    list_image_files,
+    preview_cache_path,
+    temp_path_for,
+    thumbnail_cache_path,
+)
+
+# 썸네일 가로 크기 (픽셀)
+THUMBNAIL_WIDTH = 300
+
+# 명암 범위 변환이 필요한 16비트/부동소수 이미지 모드
+HIGH_BIT_MODES = ("I", "I;16", "I;16B", "I;16L", "F")
+# Pillow의 정수 배율 축소(reduce)를 지원하는 모드
+REDUCIBLE_MODES = ("L", "LA", "RGB", "RGBA", "CMYK", "I", "F")
+
+# 원본 이미지의 최대 픽셀 수
+# NAS의 스캔 원본은 신뢰할 수 있는 입력이므로 Pillow 기본 제한(약 1.8억 픽셀) 대신 이 값을 사용합니다.
+MAX_SOURCE_PIXELS = 1_000_000_000
+
+# 대용량 이미지의 미리보기 가로 크기 (고정 크기만 허용하여 캐시 재사용률을 높임)
+PREVIEW_WIDTHS = (512, 1024, 2048)
+
+# 이미지 폴더 썸네일(콘택트 시트)에 넣을 이미지 수와 열 수
+CONTACT_SHEET_COUNT = 9
+CONTACT_SHEET_COLUMNS = 3
+# 축소 디코딩(JPEG draft)이 불가능한 이미지 중 이보다 픽셀 수가 많은 이미지는 건너뜁니다.
+# 한 번에 한 장씩만 디코딩하므로 최대 메모리 사용량은 폴더 크기와 무관하게 이 값으로 제한됩니다.
+CONTACT_SHEET_MAX_DECODE_PIXELS = 16_000_000
+
+# Pillow 픽셀 제한 설정 여부 (처음 Pillow를 사용할 때 한 번만 설정)
+_pillow_configured = False
+
+# DOCX 변환 전용 스레드 (처음 변환할 때 생성)
+_docx_executor = None
+_docx_executor_lock = threading.Lock()
+
+
+class ImageTooLargeError(ValueError):
+    """원본 이미지의 픽셀 수가 MAX_SOURCE_PIXELS를 넘는 경우"""
+
+
+def _pillow_image():
+    """
+    PIL.Image 모듈을 반환합니다.
+    처음 호출될 때 픽셀 제한(MAX_IMAGE_PIXELS)을 MAX_SOURCE_PIXELS로 한 번만 설정하므로,
+    reportlab 등 내부에서 Pillow로 여는 경우를 포함해 모든 경로에 같은 제한이 적용됩니다.
+    """
+    global _pillow_configured
+    from PIL import Image
+
+    if not _pillow_configured:
+        Image.MAX_IMAGE_PIXELS = MAX_SOURCE_PIXELS
+        _pillow_configured = True
+    return Image
+
+
+def open_source_image(image_path: str):
+    """
+    원본 이미지를 엽니다. (헤더만 읽으며, 픽셀은 사용할 때 디코딩)
+
+    Raises:
+        ImageTooLargeError: 픽셀 수가 MAX_SOURCE_PIXELS를 넘는 경우
+    """
+    Image = _pillow_image()
+    try:
+        img = Image.open(image_path)
+    except Image.DecompressionBombError as e:
+        raise ImageTooLargeError(str(e)) from e
+
+    if img.width * img.height > MAX_SOURCE_PIXELS:
+        size = img.size
+        img.close()
+        raise ImageTooLargeError(
+            f"이미지가 너무 큽니다: {size[0]}x{size[1]} (최대 {MAX_SOURCE_PIXELS:,} 픽셀)"
+        )
+    return img
+
+
+def render_pdf_thumbnail(pdf_path: str, output_path: str, width: int = THUMBNAIL_WIDTH):
+    """PDF 첫 페이지를 PNG 썸네일로 렌더링합니다."""
+    import fitz
+
+    with fitz.open(pdf_path) as doc:
+        page = doc.load_page(0)
+        zoom = width / page.rect.width
+        pixmap = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+        pixmap.save(output_path)
+
+
+def render_image_thumbnail(image_path: str, output_path: str, width: int = THUMBNAIL_WIDTH):
+    """이미지 파일을 PNG 썸네일로 축소합니다."""
+    with open_source_image(image_path) as img:
+        # JPEG는 디코딩 단계에서 축소하여 메모리 사용을 줄입니다.
+        img.draft('RGB', (width, width))
+        thumbnail = reduced_rgb(img, (width, width * 2))
+    thumbnail.save(output_path, 'PNG')
+
+
+def render_image_preview(image_path: str, output_path: str, width: int):
+    """이미지를 지정한 가로 크기 이하로 축소한 JPEG 미리보기를 생성합니다."""
+    with open_source_image(image_path) as img:
+        img.draft("RGB", (width, width))
+        preview = reduced_rgb(img, (width, img.height * width // max(img.width, 1) + 1))
+    preview.save(output_path, "JPEG", quality=85)
+
+
+def to_8bit(img):
+    """
+    이미지를 8비트(L 또는 RGB)로 변환합니다. L/RGB 이미지는 복사하지 않고 그대로 반환합니다.
+    16비트/부동소수 이미지(의료 영상에 흔함)는 명암 범위를 8비트로 맞춘 흑백(L)으로 변환합니다.
+    """
+    if img.mode in HIGH_BIT_MODES:
+        if img.mode not in ("I", "F"):
+            # I;16B/I;16L(빅/리틀 엔디언 16비트 TIFF 등)은 point()를 지원하지 않으므로 32비트 정수로 변환
+            img = img.convert("I")
+        low, high = img.getextrema()
+        scale = 255.0 / max(high - low, 1)
+        return img.point(lambda value: (value - low) * scale).convert("L")
+    if img.mode in ("L", "RGB"):
+        return img
+    return img.convert("RGB")
+
+
+def reduced_rgb(img, size):
+    """
+    이미지를 size 이내로 축소한 RGB 이미지를 반환합니다.
+    원본 모드 그대로 정수 배율로 먼저 줄인 뒤(reduce) 변환하므로, 전체 해상도의 변환 사본은
+    축소를 지원하지 않는 모드(16비트 등)에서만 만들어집니다.
+    """
+    factor = max(1, min(img.width // max(size[0], 1), img.height // max(size[1], 1)))
+    if factor > 1:
+        if img.mode not in REDUCIBLE_MODES:
+            img = to_8bit(img)
+        img = img.reduce(factor)
+    img = to_8bit(img)
+    img.thumbnail(size)
+    return img.convert("RGB")
+
+
+def render_contact_sheet(folder_path: str, output_path: str, width: int = THUMBNAIL_WIDTH,
+                         count: int = CONTACT_SHEET_COUNT):
+    """
+    이미지 폴더의 앞쪽 이미지들을 격자로 배치한 콘택트 시트 썸네일을 생성합니다.
+    이미지는 한 장씩 열어 바로 칸 크기로 줄인 뒤 닫으며, JPEG는 축소 모드(draft)로 디코딩합니다.
+    """
+    Image = _pillow_image()
+
+    image_paths = list_image_files(folder_path)[:count]
+    if not image_paths:
+        raise ValueError(f"이미지가 없는 폴더입니다: {folder_path}")
+
+    columns = min(CONTACT_SHEET_COLUMNS, len(image_paths))
+    rows = (len(image_paths) + columns - 1) // columns
+    cell = width // columns
+    sheet = Image.new("RGB", (cell * columns, cell * rows), (0, 0, 0))
+
+    for index, image_path in enumerate(image_paths):
+        try:
+            with open_source_image(image_path) as img:
+                # JPEG는 칸 크기에 가까운 1/2~1/8 해상도로 디코딩됩니다.
+                img.draft("RGB", (cell, cell))
+                if img.width * img.height > CONTACT_SHEET_MAX_DECODE_PIXELS:
+                    continue
+                tile = reduced_rgb(img, (cell, cell))
+        except Exception as e:
+            print(f"콘택트 시트 이미지 건너뜀: {image_path} - {e}")
+            continue
+
+        x = (index % columns) * cell + (cell - tile.width) // 2
+        y = (index // columns) * cell + (cell - tile.height) // 2
+        sheet.paste(tile, (x, y))
+        tile.close()
+
+    sheet.save(output_path, "PNG")
+
+
+def _initialize_com():
+    """DOCX 변환 스레드의 COM 초기화 (Windows에서 Word를 제어하기 위해 필요)"""
+    try:
+        import pythoncom
+    except ImportError:
+        # Windows가 아닌 환경 (docx2pdf가 COM을 사용하지 않음)
+        return
+    pythoncom.CoInitialize()
+
+
+def _convert_docx(docx_path: str, output_path: str):
+    from docx2pdf import convert
+
+    convert(docx_path, output_path)
+
+
+def convert_docx_to_pdf(docx_path: str, output_path: str):
+    """
+    DOCX 파일을 PDF로 변환합니다.
+    docx2pdf는 Word를 COM으로 제어하므로 요청/미리 생성 스레드에서 직접 호출하지 않고,
+    COM이 초기화된 전용 스레드 하나에서 순서대로 변환합니다. (Word를 동시에 여러 개 구동하지 않음)
+    """
+    global _docx_executor
+    with _docx_executor_lock:
+        if _docx_executor is None:
+            _docx_executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="docx2pdf", initializer=_initialize_com
+            )
+    _docx_executor.submit(_convert_docx, docx_path, output_path).result()
+
+
+def images_to_pdf(folder_path: str, output_path: str):
+    """이미지 폴더의 모든 이미지를 한 페이지씩 단일 PDF로 묶습니다."""
+    from reportlab.pdfgen import canvas
+
+    image_paths = list_image_files(folder_path)
+    if not image_paths:
+        raise ValueError(f"이미지가 없는 폴더입니다: {folder_path}")
+
+    pdf = canvas.Canvas(output_path)
+    for image_path in image_paths:
+        with open_source_image(image_path) as img:
+            width, height = img.size
+        pdf.setPageSize((width, height))
+        pdf.drawImage(image_path, 0, 0, width, height)
+        pdf.showPage()
+    pdf.save()
+
+
+def _build_cached(target_path: str, builder: Callable[[str, str], None], source_path: str) -> str:
+    """
+    캐시 파일이 없으면 builder로 생성합니다.
+    임시 파일에 먼저 기록한 뒤 교체하므로 불완전한 파일이 캐시에 남지 않습니다.
+    """
+    if os.path.exists(target_path):
+        return target_path
+
+    with key_lock(target_path):
+        if os.path.exists(target_path):
+            return target_path
+
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        temp_path = temp_path_for(target_path)
+        try:
+            builder(source_path, temp_path)
+            os.replace(temp_path, target_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    return target_path
+
+
+def get_pdf(file_path: str, file_type: str, fingerprint: str) -> str:
+    """
+    파일을 PDF로 제공하기 위한 경로를 반환합니다.
+    PDF는 원본 경로를, DOCX와 이미지 폴더는 캐시된 변환 결과 경로를 반환합니다.
+    """
+    if file_type == "PDF":
+        return file_path
+    if file_type == "DOCX":
+        return _build_cached(converted_cache_path(fingerprint), convert_docx_to_pdf, file_path)
+    if file_type == "IMAGE_FOLDER":
+        return _build_cached(converted_cache_path(fingerprint), images_to_pdf, file_path)
+    raise ValueError(f"PDF로 변환할 수 없는 파일 형식입니다: {file_type}")
+
+
+def get_thumbnail(file_path: str, file_type: str, fingerprint: str) -> str:
+    """파일 형식에 맞게 썸네일을 생성(또는 캐시에서 조회)하여 경로를 반환합니다."""
+    target_path = thumbnail_cache_path(fingerprint)
+
+    if file_type in ("PDF", "DOCX"):
+        if os.path.exists(target_path):
+            return target_path
+        pdf_path = get_pdf(file_path, file_type, fingerprint)
+        return _build_cached(target_path, render_pdf_thumbnail, pdf_path)
+    if file_type == "IMAGE":
+        return _build_cached(target_path, render_image_thumbnail, file_path)
+    if file_type == "IMAGE_FOLDER":
+        # 폴더 지문(이미지 이름/크기 목록)이 키이므로 이미지가 바뀌면 새로 생성됩니다.
+        return _build_cached(target_path, render_contact_sheet, file_path)
+    raise ValueError(f"썸네일을 생성할 수 없는 파일 형식입니다: {file_type}")
+
+
+def get_preview(file_path: str, fingerprint: str, width: int) -> str:
+    """이미지 파일의 미리보기 이미지를 생성(또는 캐시에서 조회)하여 경로를 반환합니다."""
+    if width not in PREVIEW_WIDTHS:
+        raise ValueError(f"지원하지 않는 미리보기 크기입니다: {width}")
+    return _build_cached(
+        preview_cache_path(fingerprint, width),
+        lambda source_path, output_path: render_image_preview(source_path, output_path, width),
+        file_path,
+    )
@@ -0,0 +1,409 @@
+"""
+디렉토리 수정시각 기반 폴링 감시자
+SMB/NFS 마운트처럼 OS 파일 이벤트가 전달되지 않는 경로를 위한 감시 백엔드입니다.
+
+watchdog의 PollingObserver는 매 주기마다 모든 파일을 stat 하지만,
+이 감시자는 디렉토리의 수정시각(mtime)만 확인하고 mtime이 바뀐 디렉토리만
+다시 나열(scandir)합니다. 파일의 추가/삭제/이름변경은 부모 디렉토리의 mtime을
+변경하므로 파일 수백만 개 규모에서도 디렉토리 수만큼의 stat 비용으로 변경을 감지합니다.
+
+파일 내용만 바뀌는 제자리 수정은 디렉토리 mtime을 바꾸지 않으므로, 매 패스마다 저장된 파일
+일부(recheck_per_poll개)를 순서대로 다시 stat 하여 크기/수정시각 변경을 확인합니다.
+모든 파일을 한 바퀴 확인하는 데는 (파일 수 / recheck_per_poll) × 폴링 주기가 걸립니다.
+
+감지된 변경은 watchdog 이벤트 객체로 변환되어 기존 핸들러(MedicalFileHandler)의
+dispatch()로 전달되므로 Observer와 동일하게 사용할 수 있습니다.
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from watchdog.events import (
+    DirCreatedEvent,
+    DirDeletedEvent,
+    DirMovedEvent,
+    FileCreatedEvent,
+    FileDeletedEvent,
+    FileModifiedEvent,
+    FileMovedEvent,
+    FileSystemEventHandler,
+)
+
+# 스냅샷 엔트리: (is_dir, size, mtime_ns, inode)
+Entry = Tuple[int, int, int, int]
+
+SNAPSHOT_VERSION = 2
+
+# 패스마다 다시 stat 할 파일 수 (제자리 수정 감지용, 0이면 끔)
+FILE_RECHECK_PER_POLL = 2000
+# 다시 확인할 디렉토리를 한 번에 읽는 개수
+RECHECK_DIR_BATCH = 64
+
+
+class DirectorySnapshot:
+    """
+    하나의 감시 루트에 대한 디렉토리 트리 스냅샷
+
+    디스크(SQLite)에는 디렉토리마다 한 행(상대 경로, mtime_ns, 엔트리 JSON)으로 저장하고,
+    다시 나열한 디렉토리의 행만 갱신하므로 저장 비용은 변경된 디렉토리 수에 비례합니다.
+    메모리에는 매 패스 비교에 필요한 디렉토리 mtime만 두고, 엔트리는 필요할 때 읽습니다.
+    """
+
+    def __init__(self, root: str, path: str):
+        self.root = os.path.abspath(root)
+        self.path = path
+        self.dir_mtimes: Dict[str, int] = {}
+        # 파일 재확인을 이어갈 위치 (마지막으로 확인한 디렉토리)
+        self.recheck_cursor: Optional[str] = None
+        self._connection: Optional[sqlite3.Connection] = None
+
+    def abs_path(self, rel: str) -> str:
+        return os.path.join(self.root, rel) if rel else self.root
+
+    def open(self) -> bool:
+        """
+        스냅샷 파일을 엽니다.
+
+        Returns:
+            bool: 이어서 비교할 수 있는 완성된 스냅샷이 있으면 True (없으면 비어 있는 상태로 초기화)
+        """
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS dirs "
+            "(rel TEXT PRIMARY KEY, mtime_ns INTEGER NOT NULL, entries TEXT NOT NULL)"
+        )
+        self._connection = connection
+
+        meta = dict(connection.execute("SELECT key, value FROM meta"))
+        if (meta.get('version') == str(SNAPSHOT_VERSION) and meta.get('root') == self.root
+                and meta.get('complete') == '1'):
+            self.dir_mtimes = dict(connection.execute("SELECT rel, mtime_ns FROM dirs"))
+            return True
+
+        connection.execute("DELETE FROM dirs")
+        connection.execute("DELETE FROM meta")
+        connection.executemany(
+            "INSERT INTO meta (key, value) VALUES (?, ?)",
+            [('version', str(SNAPSHOT_VERSION)), ('root', self.root)],
+        )
+        connection.commit()
+        self.dir_mtimes = {}
+        return False
+
+    def mark_complete(self):
+        """기준 스냅샷 생성이 끝났음을 기록합니다. (도중에 중단되면 다음 시작 때 다시 생성)"""
+        self._connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('complete', '1')")
+        self._connection.commit()
+
+    def commit(self):
+        self._connection.commit()
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.commit()
+            self._connection.close()
+            self._connection = None
+
+    def entries(self, rel: str) -> Dict[str, Entry]:
+        """디렉토리의 저장된 엔트리를 반환합니다."""
+        row = self._connection.execute("SELECT entries FROM dirs WHERE rel = ?", (rel,)).fetchone()
+        if row is None:
+            return {}
+        return {name: tuple(entry) for name, entry in json.loads(row[0]).items()}
+
+    def put(self, rel: str, mtime: int, entries: Dict[str, Entry]):
+        """디렉토리 행을 갱신합니다. (commit은 폴링 패스가 끝날 때 한 번)"""
+        self.dir_mtimes[rel] = mtime
+        self._connection.execute(
+            "INSERT OR REPLACE INTO dirs (rel, mtime_ns, entries) VALUES (?, ?, ?)",
+            (rel, mtime, json.dumps(
+                {name: list(entry) for name, entry in entries.items()},
+                ensure_ascii=False, separators=(',', ':'),
+            )),
+        )
+
+    def dirs_after(self, rel: Optional[str], limit: int) -> List[Tuple[str, Dict[str, Entry]]]:
+        """상대 경로 순서로 rel 다음 디렉토리들의 엔트리를 반환합니다. (rel이 None이면 처음부터)"""
+        if rel is None:
+            rows = self._connection.execute(
+                "SELECT rel, entries FROM dirs ORDER BY rel LIMIT ?", (limit,)
+            )
+        else:
+            rows = self._connection.execute(
+                "SELECT rel, entries FROM dirs WHERE rel > ? ORDER BY rel LIMIT ?", (rel, limit)
+            )
+        return [
+            (key, {name: tuple(entry) for name, entry in json.loads(entries).items()})
+            for key, entries in rows.fetchall()
+        ]
+
+    def remove_subtree(self, rel: str) -> List[Tuple[str, Entry]]:
+        """rel 디렉토리와 그 하위 디렉토리 스냅샷을 제거하고, 제거된 하위 엔트리를 반환합니다."""
+        prefix = rel + os.sep
+        upper = rel + chr(ord(os.sep) + 1)
+        condition = "rel = ? OR (rel >= ? AND rel < ?)"
+        rows = self._connection.execute(
+            f"SELECT rel, entries FROM dirs WHERE {condition}", (rel, prefix, upper)
+        ).fetchall()
+        self._connection.execute(f"DELETE FROM dirs WHERE {condition}", (rel, prefix, upper))
+
+        removed = []
+        for key, entries in rows:
+            self.dir_mtimes.pop(key, None)
+            for name, entry in json.loads(entries).items():
+                removed.append((os.path.join(key, name), tuple(entry)))
+        return removed
+
+
+class MtimePollingObserver(threading.Thread):
+    """
+    디렉토리 mtime을 이용해 변경된 하위 트리만 다시 읽는 폴링 감시자
+
+    watchdog Observer와 같은 schedule()/start()/stop()/join() 인터페이스를 제공합니다.
+    """
+
+    def __init__(self, snapshot_dir: str, interval: float = 5.0,
+                 recheck_per_poll: int = FILE_RECHECK_PER_POLL):
+        super().__init__(daemon=True)
+        self.snapshot_dir = snapshot_dir
+        self.interval = interval
+        self.recheck_per_poll = recheck_per_poll
+        self.logger = logging.getLogger('watcher')
+
+        self._watches: List[Tuple[FileSystemEventHandler, DirectorySnapshot]] = []
+        self._stopped = threading.Event()
+
+    def schedule(self, handler: FileSystemEventHandler, path: str, recursive: bool = True):
+        """감시 경로를 등록합니다. (하위 폴더는 항상 포함됩니다)"""
+        root = os.path.abspath(path)
+        root_hash = hashlib.sha1(root.encode('utf-8')).hexdigest()[:16]
+        snapshot_path = os.path.join(self.snapshot_dir, f"poll_{root_hash}.sqlite")
+        self._watches.append((handler, DirectorySnapshot(root, snapshot_path)))
+
+    def stop(self):
+        self._stopped.set()
+
+    def run(self):
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+
+        # 저장된 스냅샷이 있으면 이어서 비교하고 (중지 중의 변경도 감지됨),
+        # 없으면 이벤트 없이 기준 스냅샷을 만듭니다.
+        for handler, snapshot in self._watches:
+            if snapshot.open():
+                self.logger.info(
+                    f"폴링 스냅샷 로드: {snapshot.root} (디렉토리 {len(snapshot.dir_mtimes)}개)"
+                )
+            else:
+                self._build_baseline(snapshot)
+                snapshot.mark_complete()
+                self.logger.info(
+                    f"폴링 기준 스냅샷 생성: {snapshot.root} (디렉토리 {len(snapshot.dir_mtimes)}개)"
+                )
+
+        try:
+            while not self._stopped.is_set():
+                started = time.monotonic()
+                for handler, snapshot in self._watches:
+                    try:
+                        self._poll(snapshot, handler)
+                    except Exception as e:
+                        self.logger.error(f"폴링 중 오류: {snapshot.root} - {str(e)}")
+                    finally:
+                        snapshot.commit()
+
+                elapsed = time.monotonic() - started
+                self._stopped.wait(max(0.0, self.interval - elapsed))
+        finally:
+            for _, snapshot in self._watches:
+                snapshot.close()
+
+    def _scan_dir(self, path: str) -> Tuple[int, Dict[str, Entry]]:
+        """디렉토리 하나를 나열하여 (mtime_ns, 엔트리) 를 반환합니다."""
+        dir_mtime = os.stat(path).st_mtime_ns
+        entries = {}
+        with os.scandir(path) as it:
+            for item in it:
+                try:
+                    is_dir = item.is_dir(follow_symlinks=False)
+                    stat = item.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                entries[item.name] = (
+                    1 if is_dir else 0,
+                    0 if is_dir else stat.st_size,
+                    stat.st_mtime_ns,
+                    stat.st_ino,
+                )
+        return dir_mtime, entries
+
+    def _walk_into(self, snapshot: DirectorySnapshot, rel: str) -> List[Tuple[str, Entry]]:
+        """
+        rel 이하 트리를 새로 읽어 스냅샷에 추가하고, 발견된 하위 엔트리를
+        (상대 경로, Entry) 목록으로 부모 → 자식 순서로 반환합니다.
+        """
+        found = []
+        stack = [rel]
+        while stack:
+            current = stack.pop()
+            try:
+                mtime, entries = self._scan_dir(snapshot.abs_path(current))
+            except OSError:
+                continue
+            snapshot.put(current, mtime, entries)
+            for name, entry in sorted(entries.items()):
+                child = os.path.join(current, name) if current else name
+                found.append((child, entry))
+                if entry[0]:
+                    stack.append(child)
+        return found
+
+    def _build_baseline(self, snapshot: DirectorySnapshot):
+        if os.path.isdir(snapshot.root):
+            self._walk_into(snapshot, '')
+
+    def _poll(self, snapshot: DirectorySnapshot, handler: FileSystemEventHandler) -> bool:
+        """
+        한 번의 폴링 패스를 수행합니다.
+        디렉토리마다 stat 한 번만 수행하고, mtime이 바뀐 디렉토리만 다시 나열합니다.
+        """
+        created: List[Tuple[str, Entry]] = []
+        deleted: List[Tuple[str, Entry]] = []
+        modified: List[str] = []
+
+        for rel in list(snapshot.dir_mtimes):
+            old_mtime = snapshot.dir_mtimes.get(rel)
+            if old_mtime is None:
+                # 이번 패스에서 이미 제거된 하위 트리
+                continue
+            try:
+                if os.stat(snapshot.abs_path(rel)).st_mtime_ns == old_mtime:
+                    continue
+                new_mtime, new_entries = self._scan_dir(snapshot.abs_path(rel))
+            except OSError:
+                # 삭제된 디렉토리는 부모 디렉토리의 변경으로 처리됩니다.
+                continue
+
+            old_entries = snapshot.entries(rel)
+            snapshot.put(rel, new_mtime, new_entries)
+
+            for name, entry in new_entries.items():
+                child = os.path.join(rel, name) if rel else name
+                old = old_entries.get(name)
+                if old is None or old[0] != entry[0]:
+                    if old is not None:
+                        deleted.append((child, old))
+                    created.append((child, entry))
+                elif not entry[0] and (old[1], old[2]) != (entry[1], entry[2]):
+                    modified.append(child)
+
+            for name, old in old_entries.items():
+                if name not in new_entries:
+                    deleted.append((os.path.join(rel, name) if rel else name, old))
+
+        rechecked = set(modified)
+        modified.extend(child for child in self._recheck_files(snapshot) if child not in rechecked)
+
+        if not (created or deleted or modified):
+            return False
+
+        self._emit_changes(snapshot, handler, created, deleted, modified)
+        return True
+
+    def _recheck_files(self, snapshot: DirectorySnapshot) -> List[str]:
+        """
+        저장된 파일 중 recheck_per_poll개를 이어서 다시 stat 하고, 크기/수정시각이 바뀐 파일을 반환합니다.
+        (추가/삭제는 디렉토리 mtime으로 감지되므로 여기서는 제자리 수정만 확인합니다)
+        """
+        modified = []
+        budget = self.recheck_per_poll
+        while budget > 0:
+            rows = snapshot.dirs_after(snapshot.recheck_cursor, RECHECK_DIR_BATCH)
+            if not rows:
+                # 한 바퀴를 마쳤으면 다음 패스에서 처음부터 다시 확인
+                snapshot.recheck_cursor = None
+                break
+
+            for rel, entries in rows:
+                snapshot.recheck_cursor = rel
+                changed = False
+                for name, entry in entries.items():
+                    if entry[0]:
+                        continue
+                    budget -= 1
+                    child = os.path.join(rel, name) if rel else name
+                    try:
+                        stat = os.stat(snapshot.abs_path(child))
+                    except OSError:
+                        continue
+                    if (stat.st_size, stat.st_mtime_ns) != (entry[1], entry[2]):
+                        entries[name] = (0, stat.st_size, stat.st_mtime_ns, stat.st_ino)
+                        modified.append(child)
+                        changed = True
+                if changed and rel in snapshot.dir_mtimes:
+                    snapshot.put(rel, snapshot.dir_mtimes[rel], entries)
+                if budget <= 0:
+                    break
+        return modified
+
+    def _emit_changes(self, snapshot: DirectorySnapshot, handler: FileSystemEventHandler,
+                      created: List[Tuple[str, Entry]], deleted: List[Tuple[str, Entry]],
+                      modified: List[str]):
+        """수집된 변경을 이동/삭제/생성/수정 이벤트로 변환하여 핸들러에 전달합니다."""
+        # inode가 같은 삭제+생성 쌍은 이동으로 간주합니다. (inode를 알 수 없는 경우 0)
+        deleted_by_inode = {entry[3]: (rel, entry) for rel, entry in deleted if entry[3]}
+        moves = []
+        remaining_created = []
+        for rel, entry in created:
+            match = deleted_by_inode.pop(entry[3], None) if entry[3] else None
+            if match is not None and match[1][0] == entry[0]:
+                moves.append((match[0], rel, entry))
+            else:
+                remaining_created.append((rel, entry))
+        moved_sources = {src for src, _, _ in moves}
+        remaining_deleted = [(rel, entry) for rel, entry in deleted if rel not in moved_sources]
+
+        # 폴더 이동/삭제는 폴더 이벤트 하나만 보냅니다.
+        # (핸들러가 하위 레코드까지 한 번에 처리합니다)
+        for src_rel, dest_rel, entry in moves:
+            if entry[0]:
+                snapshot.remove_subtree(src_rel)
+                self._walk_into(snapshot, dest_rel)
+                self._dispatch(handler, DirMovedEvent(
+                    snapshot.abs_path(src_rel), snapshot.abs_path(dest_rel)))
+            else:
+                self._dispatch(handler, FileMovedEvent(
+                    snapshot.abs_path(src_rel), snapshot.abs_path(dest_rel)))
+
+        for rel, entry in remaining_deleted:
+            if entry[0]:
+                snapshot.remove_subtree(rel)
+                self._dispatch(handler, DirDeletedEvent(snapshot.abs_path(rel)))
+            else:
+                self._dispatch(handler, FileDeletedEvent(snapshot.abs_path(rel)))
+
+        for rel, entry in remaining_created:
+            if entry[0]:
+                children = self._walk_into(snapshot, rel)
+                self._dispatch(handler, DirCreatedEvent(snapshot.abs_path(rel)))
+                for child_rel, child_entry in children:
+                    event_cls = DirCreatedEvent if child_entry[0] else FileCreatedEvent
+                    self._dispatch(handler, event_cls(snapshot.abs_path(child_rel)))
+            else:
+                self._dispatch(handler, FileCreatedEvent(snapshot.abs_path(rel)))
+
+        for rel in modified:
+            self._dispatch(handler, FileModifiedEvent(snapshot.abs_path(rel)))
+
+    def _dispatch(self, handler: FileSystemEventHandler, event):
+        try:
+            handler.dispatch(event)
+        except Exception as e:
+            self.logger.error(f"이벤트 처리 중 오류: {event.src_path} - {str(e)}")
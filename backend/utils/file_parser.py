@@ -6,6 +6,9 @@ import re
 import os
 from typing import Dict
 
+# 이미지로 분류되는 확장자
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.tif', '.gif')
+
 
 class FileNameParser:
     """파일명에서 환자명과 등록번호를 추출하는 클래스"""
@@ -141,7 +144,7 @@ class FileNameParser:
             return "PDF"
         elif ext in ['.docx', '.doc']:
             return "DOCX"
-        elif ext in ['.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.gif']:
+        elif ext in IMAGE_EXTENSIONS:
             return "IMAGE"
         else:
             return "UNKNOWN"
@@ -0,0 +1,96 @@
+"""
+파생물 미리 생성(prefetch) 유틸리티
+검색 결과 상위 항목의 썸네일과 PDF 변환 결과를 백그라운드에서 미리 만들어 두어,
+클라이언트가 요청할 때는 캐시에서 바로 응답할 수 있도록 합니다.
+
+- 작업 스레드 수와 대기 작업 수에 상한이 있습니다.
+- 같은 클라이언트가 새로 검색하면 이전 검색의 대기 중인 작업은 취소됩니다.
+"""
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional
+
+from utils.cache import compute_fingerprint
+from utils.converter import get_pdf, get_thumbnail
+
+# 썸네일을 만들 수 있는 파일 형식
+THUMBNAIL_TYPES = ("PDF", "DOCX", "IMAGE", "IMAGE_FOLDER")
+# PDF로 변환이 필요한 파일 형식 (PDF는 원본을 그대로 제공)
+CONVERTIBLE_TYPES = ("DOCX", "IMAGE_FOLDER")
+
+
+class PrefetchItem(NamedTuple):
+    """미리 생성할 레코드 정보 (DB 세션과 무관하게 작업 스레드로 전달)"""
+    file_path: str
+    file_type: str
+    fingerprint: Optional[str]
+
+
+class DerivativePrefetcher:
+    """검색 결과 상위 N개의 파생물을 미리 생성하는 백그라운드 작업자"""
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 64):
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        # 취소/완료 콜백이 락을 잡은 스레드에서 바로 호출될 수 있으므로 재진입 가능한 락 사용
+        self._lock = threading.RLock()
+        self._pending: Dict[str, List[Future]] = {}
+
+    def schedule(self, client_key: str, items: List[PrefetchItem], open_count: int = 2) -> int:
+        """
+        클라이언트의 이전 대기 작업을 취소하고 새 작업을 등록합니다.
+        썸네일을 순위대로 먼저 만들고, 상위 open_count개는 PDF 변환도 수행합니다.
+
+        Returns:
+            int: 등록된 작업 수
+        """
+        tasks = [(get_thumbnail, item) for item in items if item.file_type in THUMBNAIL_TYPES]
+        tasks += [
+            (get_pdf, item) for item in items[:open_count]
+            if item.file_type in CONVERTIBLE_TYPES
+        ]
+
+        with self._lock:
+            self._cancel_locked(client_key)
+            capacity = self.max_pending - sum(len(futures) for futures in self._pending.values())
+            futures = [
+                self._executor.submit(self._run, builder, item)
+                for builder, item in tasks[:max(0, capacity)]
+            ]
+            if futures:
+                self._pending[client_key] = futures
+            for future in futures:
+                future.add_done_callback(lambda f, key=client_key: self._discard(key, f))
+
+        return len(futures)
+
+    def cancel(self, client_key: str):
+        """클라이언트의 대기 중인 작업을 취소합니다. (이미 실행 중인 작업은 끝까지 수행)"""
+        with self._lock:
+            self._cancel_locked(client_key)
+
+    def shutdown(self):
+        with self._lock:
+            for client_key in list(self._pending):
+                self._cancel_locked(client_key)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _cancel_locked(self, client_key: str):
+        for future in self._pending.pop(client_key, []):
+            future.cancel()
+
+    def _discard(self, client_key: str, future: Future):
+        with self._lock:
+            futures = self._pending.get(client_key)
+            if futures and future in futures:
+                futures.remove(future)
+                if not futures:
+                    del self._pending[client_key]
+
+    @staticmethod
+    def _run(builder, item: PrefetchItem):
+        try:
+            fingerprint = item.fingerprint or compute_fingerprint(item.file_path)
+            builder(item.file_path, item.file_type, fingerprint)
+        except Exception as e:
+            print(f"미리 생성 실패: {item.file_path} - {e}")
@@ -0,0 +1,131 @@
+"""
+이미지 타일 피라미드 유틸리티
+대용량 스캔 이미지(TIFF 등)를 여러 배율의 타일로 나누어 캐시합니다.
+뷰어는 확대/이동 시 화면에 보이는 타일만 요청하므로 원본 전체를 받을 필요가 없습니다.
+
+레벨 구성:
+    - 최고 레벨(max_level)은 원본 해상도
+    - 레벨이 1 낮아질 때마다 가로/세로 1/2
+    - 레벨 0은 이미지 전체가 타일 하나에 들어가는 크기
+    - 타일 경로: {레벨}/{x}_{y}.jpg (가장자리 타일은 TILE_SIZE보다 작을 수 있음)
+"""
+import json
+import os
+import shutil
+from typing import Dict
+
+from utils.cache import key_lock, temp_path_for, tile_cache_dir
+from utils.converter import open_source_image, to_8bit
+
+TILE_SIZE = 256
+TILE_QUALITY = 85
+PYRAMID_META_FILE = "pyramid.json"
+
+
+def _max_level(width: int, height: int) -> int:
+    level = 0
+    longest = max(width, height)
+    while longest > TILE_SIZE:
+        longest = (longest + 1) // 2
+        level += 1
+    return level
+
+
+def build_pyramid(image_path: str, output_dir: str) -> Dict:
+    """
+    이미지 한 장으로 타일 피라미드를 생성합니다.
+    원본은 한 번만 디코딩하고, 낮은 레벨은 직전 레벨을 1/2로 줄여 만듭니다.
+    L/RGB 원본은 변환 사본 없이 그대로 잘라 쓰며, 흑백 원본의 타일은 흑백 JPEG로 저장됩니다.
+    """
+    source = open_source_image(image_path)
+    try:
+        level_image = to_8bit(source)
+    except Exception:
+        source.close()
+        raise
+    if level_image is not source:
+        # 변환 사본을 만들었으면 원본은 바로 닫습니다. (L/RGB는 원본을 그대로 사용)
+        source.close()
+
+    width, height = level_image.size
+    max_level = _max_level(width, height)
+
+    for level in range(max_level, -1, -1):
+        level_dir = os.path.join(output_dir, str(level))
+        os.makedirs(level_dir, exist_ok=True)
+
+        columns = (level_image.width + TILE_SIZE - 1) // TILE_SIZE
+        rows = (level_image.height + TILE_SIZE - 1) // TILE_SIZE
+        for x in range(columns):
+            for y in range(rows):
+                box = (
+                    x * TILE_SIZE,
+                    y * TILE_SIZE,
+                    min((x + 1) * TILE_SIZE, level_image.width),
+                    min((y + 1) * TILE_SIZE, level_image.height),
+                )
+                level_image.crop(box).save(
+                    os.path.join(level_dir, f"{x}_{y}.jpg"), "JPEG", quality=TILE_QUALITY
+                )
+
+        if level > 0:
+            next_image = level_image.reduce(2)
+            level_image.close()
+            level_image = next_image
+
+    level_image.close()
+
+    meta = {
+        'width': width,
+        'height': height,
+        'tile_size': TILE_SIZE,
+        'max_level': max_level,
+        'format': 'jpg',
+    }
+    with open(os.path.join(output_dir, PYRAMID_META_FILE), 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    return meta
+
+
+def ensure_pyramid(image_path: str, fingerprint: str) -> Dict:
+    """
+    지문에 해당하는 타일 피라미드가 없으면 생성하고 메타데이터를 반환합니다.
+    임시 디렉토리에 모두 만든 뒤 이름을 바꾸므로 생성 중인 피라미드가 노출되지 않습니다.
+    """
+    pyramid_dir = tile_cache_dir(fingerprint)
+    meta_path = os.path.join(pyramid_dir, PYRAMID_META_FILE)
+
+    if not os.path.exists(meta_path):
+        with key_lock(pyramid_dir):
+            if not os.path.exists(meta_path):
+                os.makedirs(os.path.dirname(pyramid_dir), exist_ok=True)
+                temp_dir = temp_path_for(pyramid_dir)
+                try:
+                    build_pyramid(image_path, temp_dir)
+                    if os.path.exists(pyramid_dir):
+                        # 메타 파일이 없는 불완전한 디렉토리
+                        shutil.rmtree(pyramid_dir)
+                    os.replace(temp_dir, pyramid_dir)
+                finally:
+                    if os.path.exists(temp_dir):
+                        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    with open(meta_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def get_tile(image_path: str, fingerprint: str, level: int, x: int, y: int) -> str:
+    """
+    타일 이미지 경로를 반환합니다.
+
+    Raises:
+        IndexError: 레벨 또는 좌표가 피라미드 범위를 벗어난 경우
+    """
+    meta = ensure_pyramid(image_path, fingerprint)
+    if not 0 <= level <= meta['max_level']:
+        raise IndexError(f"잘못된 타일 레벨입니다: {level}")
+
+    tile_path = os.path.join(tile_cache_dir(fingerprint), str(level), f"{x}_{y}.jpg")
+    if x < 0 or y < 0 or not os.path.exists(tile_path):
+        raise IndexError(f"잘못된 타일 좌표입니다: {level}/{x}/{y}")
+    return tile_path
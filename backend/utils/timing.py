@@ -0,0 +1,270 @@
+"""
+요청 처리 시간 측정 유틸리티
+요청마다 구간별(DB, 파일 stat, 렌더링, JSON 인코딩) 소요 시간을 모아 Server-Timing 헤더로 반환하고,
+응답 시작까지 기준 시간을 넘긴 느린 요청은 샘플링 프로파일을 디스크에 남깁니다.
+
+- 구간 시간은 contextvar에 담긴 요청별 기록에 더해지며, run_in_threadpool로 넘긴 작업에도 전달됩니다.
+- 프로파일은 기준 시간을 넘긴 시점부터 응답 헤더를 보낼 때까지 요청이 사용한 스레드의 스택을 샘플링합니다.
+  (빠른 요청은 샘플링하지 않으며, SSE/ZIP처럼 본문을 오래 스트리밍하는 요청도 헤더 이후는 제외)
+- 덤프는 flamegraph.pl / speedscope에서 바로 읽을 수 있는 collapsed stack 형식입니다.
+"""
+import contextvars
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROFILE_DIR = os.path.join(BACKEND_DIR, "logs", "profiles")
+
+# 보관할 프로파일 덤프 최대 개수 (초과 시 오래된 것부터 삭제)
+MAX_PROFILE_FILES = 200
+
+_current_timings: contextvars.ContextVar = contextvars.ContextVar("request_timings", default=None)
+
+
+class RequestTimings:
+    """요청 하나의 구간별 소요 시간과 프로파일 샘플"""
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        # 요청 처리에 사용된 스레드 (이벤트 루프 + 스레드 풀)
+        self.threads = {threading.get_ident()}
+        self.samples: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float):
+        with self._lock:
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+            self.threads.add(threading.get_ident())
+
+    def touch_thread(self):
+        """현재 스레드를 요청 처리 스레드로 기록합니다. (프로파일 대상)"""
+        with self._lock:
+            self.threads.add(threading.get_ident())
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def server_timing(self) -> str:
+        """Server-Timing 헤더 값 (예: "db;dur=12.3, render;dur=80.1, total;dur=95.0")"""
+        with self._lock:
+            phases = list(self.phases.items())
+        parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in phases]
+        parts.append(f"total;dur={self.elapsed_ms():.1f}")
+        return ", ".join(parts)
+
+
+def add_timing(name: str, seconds: float):
+    """현재 요청의 구간 시간에 더합니다. (요청 밖에서 호출되면 무시)"""
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.add(name, seconds)
+
+
+@contextmanager
+def phase(name: str):
+    """with 블록의 소요 시간을 현재 요청의 구간 시간에 더합니다."""
+    timings = _current_timings.get()
+    if timings is None:
+        yield
+        return
+    timings.touch_thread()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - started)
+
+
+async def run_phase_in_threadpool(name: str, func: Callable, *args):
+    """
+    func를 스레드 풀에서 실행하고 소요 시간을 name 구간에 더합니다.
+    실행 스레드도 요청 처리 스레드로 기록되므로 느린 요청 프로파일에 포함됩니다.
+    """
+    def run():
+        with phase(name):
+            return func(*args)
+
+    return await run_in_threadpool(run)
+
+
+def install_sqlalchemy_timing(engine):
+    """엔진의 쿼리 실행 시간을 현재 요청의 "db" 구간으로 기록합니다."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info["query_started"] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop("query_started", None)
+        if started is not None:
+            add_timing("db", time.perf_counter() - started)
+
+
+def _collapse_stack(frame) -> str:
+    """프레임을 바깥쪽부터 "함수 (파일:줄)"을 ';'로 이은 문자열로 변환합니다."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SlowRequestProfiler:
+    """
+    느린 요청 샘플링 프로파일러
+    처리 중인 요청 중 기준 시간을 넘긴 요청만 일정 주기로 스택을 샘플링합니다.
+    """
+
+    def __init__(self, threshold_ms: float, interval_ms: float = 5.0,
+                 output_dir: str = PROFILE_DIR):
+        self.threshold = threshold_ms / 1000
+        self.interval = interval_ms / 1000
+        self.output_dir = output_dir
+        self._active: Dict[int, RequestTimings] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def begin(self, timings: RequestTimings):
+        with self._lock:
+            self._active[id(timings)] = timings
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="slow-request-profiler", daemon=True
+                )
+                self._thread.start()
+        self._wakeup.set()
+
+    def end(self, timings: RequestTimings) -> Optional[str]:
+        """샘플링을 멈추고, 기준 시간을 넘긴 요청이면 덤프 파일 경로를 반환합니다."""
+        with self._lock:
+            if self._active.pop(id(timings), None) is None:
+                return None
+        elapsed_ms = timings.elapsed_ms()
+        with timings._lock:
+            samples = timings.samples.most_common()
+        if elapsed_ms < self.threshold * 1000 or not samples:
+            return None
+        try:
+            return self._write_dump(timings, samples, elapsed_ms)
+        except OSError as e:
+            print(f"프로파일 저장 실패: {timings.path} - {e}")
+            return None
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        while True:
+            with self._lock:
+                idle = not self._active
+                if idle:
+                    self._wakeup.clear()
+            if idle:
+                self._wakeup.wait()
+                continue
+
+            time.sleep(self.interval)
+            now = time.perf_counter()
+            with self._lock:
+                slow = [t for t in self._active.values() if now - t.started >= self.threshold]
+            if not slow:
+                continue
+
+            frames = sys._current_frames()
+            for timings in slow:
+                with timings._lock:
+                    threads = list(timings.threads)
+                stacks = [
+                    f"thread-{ident};{_collapse_stack(frames[ident])}"
+                    for ident in threads
+                    if ident in frames and ident != own_ident
+                ]
+                with timings._lock:
+                    timings.samples.update(stacks)
+            del frames
+
+    def _write_dump(self, timings: RequestTimings, samples: List[Tuple[str, int]],
+                    elapsed_ms: float) -> str:
+        os.makedirs(self.output_dir, exist_ok=True)
+        safe_path = re.sub(r"[^0-9A-Za-z_-]+", "_", timings.path).strip("_")[:80] or "root"
+        filename = (
+            f"{datetime.now():%Y%m%d-%H%M%S-%f}_{timings.method}_{safe_path}"
+            f"_{elapsed_ms:.0f}ms.folded"
+        )
+        dump_path = os.path.join(self.output_dir, filename)
+        with open(dump_path, "w", encoding="utf-8") as f:
+            for stack, count in samples:
+                f.write(f"{stack} {count}\n")
+        self._prune()
+        return dump_path
+
+    def _prune(self):
+        names = sorted(name for name in os.listdir(self.output_dir) if name.endswith(".folded"))
+        for name in names[:max(0, len(names) - MAX_PROFILE_FILES)]:
+            try:
+                os.remove(os.path.join(self.output_dir, name))
+            except OSError:
+                pass
+
+
+class ServerTimingMiddleware:
+    """
+    요청별 구간 시간을 Server-Timing 헤더로 반환하는 ASGI 미들웨어
+    응답 헤더를 보내기 직전에 헤더를 추가하므로 스트리밍 응답의 본문은 지연시키지 않습니다.
+    """
+
+    def __init__(self, app, profiler: Optional[SlowRequestProfiler] = None):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings(scope.get("method", ""), scope.get("path", ""))
+        token = _current_timings.set(timings)
+        if self.profiler:
+            self.profiler.begin(timings)
+        response_started = False
+
+        async def send_with_timing(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start" and not response_started:
+                response_started = True
+                self._finish(timings)
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timings.server_timing().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            if not response_started:
+                self._finish(timings)
+            _current_timings.reset(token)
+
+    def _finish(self, timings: RequestTimings):
+        if not self.profiler:
+            return
+        dump_path = self.profiler.end(timings)
+        if dump_path:
+            print(
+                f"느린 요청: {timings.method} {timings.path} "
+                f"({timings.server_timing()}) - 프로파일: {dump_path}"
+            )
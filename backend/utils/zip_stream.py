@@ -0,0 +1,89 @@
+"""
+ZIP 스트리밍 유틸리티
+ZIP 파일을 디스크나 메모리에 완성하지 않고, 만들어지는 대로 조각(bytes)을 내보냅니다.
+
+- 탐색(seek)이 불가능한 출력으로 기록하므로 각 항목 뒤에 data descriptor가 붙습니다.
+- 원본은 고정 크기 단위로 읽으므로 메모리 사용량은 파일 크기와 무관합니다.
+- 이미 압축된 형식(PDF, 이미지, DOCX)은 무압축(stored)으로 담아 CPU 사용을 줄입니다.
+"""
+import io
+import os
+import time
+import zipfile
+from typing import Iterable, Iterator, Tuple
+
+from utils.file_parser import IMAGE_EXTENSIONS
+
+# 원본 파일을 읽는 단위
+ZIP_CHUNK_SIZE = 1024 * 1024
+
+# 압축하지 않고 담을 확장자 (이미 압축된 형식)
+STORED_EXTENSIONS = ('.pdf', '.docx', '.zip') + IMAGE_EXTENSIONS
+
+
+class _ZipStreamBuffer(io.RawIOBase):
+    """ZipFile이 기록한 바이트를 모아 두었다가 꺼내 주는 탐색 불가능한 출력"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _zip_info(arcname: str, stat: os.stat_result) -> zipfile.ZipInfo:
+    # ZIP 형식은 1980년 이전 날짜를 표현할 수 없습니다.
+    date_time = max(time.localtime(stat.st_mtime)[:6], (1980, 1, 1, 0, 0, 0))
+    info = zipfile.ZipInfo(arcname, date_time=date_time)
+    extension = os.path.splitext(arcname)[1].lower()
+    info.compress_type = zipfile.ZIP_STORED if extension in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+    # 크기를 미리 알려 주면 4GB 이상 파일에 ZIP64 헤더가 사용됩니다.
+    info.file_size = stat.st_size
+    return info
+
+
+def iter_zip_stream(entries: Iterable[Tuple[str, str]]) -> Iterator[bytes]:
+    """
+    (원본 경로, ZIP 내부 경로) 목록을 ZIP으로 묶으며 조각 단위로 반환합니다.
+    읽을 수 없는 파일은 건너뜁니다.
+    """
+    buffer = _ZipStreamBuffer()
+    archive = zipfile.ZipFile(buffer, 'w', allowZip64=True)
+
+    for source_path, arcname in entries:
+        try:
+            stat = os.stat(source_path)
+            source = open(source_path, 'rb')
+        except OSError as e:
+            print(f"내보내기에서 제외: {source_path} - {e}")
+            continue
+
+        with source, archive.open(_zip_info(arcname, stat), 'w') as target:
+            # 항목 헤더를 바로 내보내 첫 바이트가 지연되지 않도록 합니다.
+            yield buffer.drain()
+            while True:
+                chunk = source.read(ZIP_CHUNK_SIZE)
+                if not chunk:
+                    break
+                target.write(chunk)
+                data = buffer.drain()
+                if data:
+                    yield data
+
+        data = buffer.drain()
+        if data:
+            yield data
+
+    # 중앙 디렉토리 기록
+    archive.close()
+    yield buffer.drain()
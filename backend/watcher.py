@@ -6,28 +6,81 @@ import os
 import time
 import json
 import logging
+import functools
+import threading
 from datetime import datetime
 from pathlib import Path
 from typing import List, Dict
 
+from sqlalchemy import and_, case, func, literal, or_
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 
+from utils.dir_poller import FILE_RECHECK_PER_POLL, MtimePollingObserver
+
 # 로컬 모듈 import (실제 환경에서는 정상 작동)
 try:
-    from database import get_db_session, init_database
+    from database import get_database_path, get_db_session, init_database
     from models import MedicalRecord
-    from utils.file_parser import FileNameParser
+    from utils.file_parser import FileNameParser, IMAGE_EXTENSIONS
+    from utils.cache import compute_fingerprint, remove_derivatives
+    from events import apply_pending_replays, record_event
 except ImportError:
     print("Warning: Could not import local modules. Running in development mode.")
 
 
+# 폴더 단위 이동/삭제를 처리한 뒤, 뒤따라오는 하위 항목 이벤트를 무시할 시간 (초)
+SUBTREE_EVENT_WINDOW = 30
+# IN (...) 조회 시 한 번에 넘기는 id 개수 (SQLite 파라미터 수 제한)
+ID_CHUNK_SIZE = 500
+# 수정 이벤트를 모았다가 재색인하기까지 기다리는 시간 (초, 마지막 이벤트 기준)
+MODIFY_DEBOUNCE_SECONDS = 2.0
+# 대기 중인 재색인을 확인하는 주기 (초)
+REINDEX_CHECK_INTERVAL = 0.5
+
+
+def _subtree_prefix(path: str) -> str:
+    """하위 항목 경로의 공통 접두어 (경로 + 구분자)"""
+    return path.rstrip("/\\") + os.sep
+
+
+def _with_database_lock(method):
+    """핸들러의 데이터베이스 작업을 한 번에 하나씩 실행합니다. (감시 스레드와 재색인 스레드 사이)"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._database_lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def _path_or_subtree(path: str):
+    """
+    경로 자신 또는 그 하위 항목을 찾는 조건
+    하위 항목은 file_path 고유 인덱스의 범위 조회([접두어, 접두어 다음 문자))로 찾습니다.
+    """
+    prefix = _subtree_prefix(path)
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return or_(
+        MedicalRecord.file_path == path,
+        and_(MedicalRecord.file_path >= prefix, MedicalRecord.file_path < upper),
+    )
+
+
 class MedicalFileHandler(FileSystemEventHandler):
     """의료 파일 변경사항을 처리하는 이벤트 핸들러"""
     
     def __init__(self):
         self.parser = FileNameParser()
         self.logger = self._setup_logger()
+        # 최근 폴더 단위로 처리한 이동/삭제의 원래 경로 접두어 → 처리 시각
+        self._recent_subtree_ops: Dict[str, float] = {}
+        # 재색인 대기 중인 경로 → 재색인 예정 시각
+        self._pending_reindex: Dict[str, float] = {}
+        self._pending_lock = threading.Lock()
+        self._reindex_thread = None
+        # 데이터베이스 작업 직렬화 (교체된 데이터베이스의 재구축 변경 반영이 다른 쓰기보다 먼저 실행되도록)
+        self._database_lock = threading.RLock()
+        self._database_path = None
         
     def _setup_logger(self):
         """로거 설정"""
@@ -49,30 +102,159 @@ class MedicalFileHandler(FileSystemEventHandler):
         
         return logger
     
+    def _open_session(self):
+        """
+        데이터베이스 세션을 엽니다. (_database_lock을 잡은 상태에서 호출)
+        인덱스 재구축으로 데이터베이스가 교체되었으면, 이 세션으로 쓰기 전에
+        재구축 중 이전 파일에 기록된 변경을 먼저 반영합니다.
+        """
+        db = get_db_session()
+        if get_database_path() != self._database_path:
+            try:
+                replayed = apply_pending_replays(db)
+            except Exception:
+                db.close()
+                raise
+            self._database_path = get_database_path()
+            if replayed:
+                self.logger.info(f"재구축 중 변경 반영: {replayed}건 ({self._database_path})")
+        return db
+    
+    @_with_database_lock
+    def check_database_switch(self):
+        """데이터베이스 교체 여부를 확인하고, 교체되었으면 재구축 중 변경을 반영합니다. (이벤트가 없어도 주기적으로 호출)"""
+        try:
+            self._open_session().close()
+        except Exception as e:
+            self.logger.error(f"재구축 중 변경 반영 실패: {str(e)}")
+    
     def on_created(self, event):
         """파일/폴더 생성 이벤트 처리"""
+        self._forget_subtree_op(event.src_path)
         if event.is_directory:
             self.logger.info(f"새 폴더 생성: {event.src_path}")
             self._process_directory(event.src_path)
         else:
             self.logger.info(f"새 파일 생성: {event.src_path}")
             self._process_file(event.src_path, action="created")
+            self._schedule_parent_folder(event.src_path)
     
     def on_deleted(self, event):
-        """파일/폴더 삭제 이벤트 처리"""
+        """파일/폴더 삭제 이벤트 처리 (폴더는 하위 레코드까지 한 번에 삭제)"""
+        if self._covered_by_subtree_op(event.src_path):
+            self.logger.debug(f"폴더 삭제로 이미 처리됨: {event.src_path}")
+            return
         self.logger.info(f"삭제됨: {event.src_path}")
         self._remove_from_database(event.src_path)
+        if not event.is_directory:
+            self._schedule_parent_folder(event.src_path)
     
     def on_moved(self, event):
-        """파일/폴더 이동 이벤트 처리"""
+        """파일/폴더 이동 이벤트 처리 (폴더는 하위 레코드 경로까지 한 번에 변경)"""
+        if self._covered_by_subtree_op(event.src_path):
+            self.logger.debug(f"폴더 이동으로 이미 처리됨: {event.src_path}")
+            return
         self.logger.info(f"이동: {event.src_path} -> {event.dest_path}")
+        self._forget_subtree_op(event.dest_path)
         self._update_file_path(event.src_path, event.dest_path)
     
     def on_modified(self, event):
-        """파일 수정 이벤트 처리 (선택적)"""
+        """파일/폴더 수정 이벤트 처리 (쓰기 도중 연속으로 발생하므로 모았다가 한 번만 재색인)"""
+        self.logger.debug(f"수정: {event.src_path}")
+        self._schedule_reindex(event.src_path)
         if not event.is_directory:
-            self.logger.debug(f"파일 수정: {event.src_path}")
-            # 필요에 따라 수정일자 업데이트 로직 추가
+            self._schedule_parent_folder(event.src_path)
+    
+    def _schedule_parent_folder(self, file_path: str):
+        """이미지 파일이 바뀌면 이를 담은 이미지 폴더의 지문도 달라지므로 폴더 재색인을 예약합니다."""
+        if os.path.splitext(file_path)[1].lower() in IMAGE_EXTENSIONS:
+            self._schedule_reindex(os.path.dirname(file_path))
+    
+    def _schedule_reindex(self, path: str):
+        """재색인을 예약합니다. 같은 경로에 이벤트가 다시 오면 예정 시각을 뒤로 미룹니다."""
+        with self._pending_lock:
+            self._pending_reindex[path] = time.monotonic() + MODIFY_DEBOUNCE_SECONDS
+            if self._reindex_thread is None:
+                self._reindex_thread = threading.Thread(
+                    target=self._run_pending_reindex, name="reindex", daemon=True
+                )
+                self._reindex_thread.start()
+    
+    def _run_pending_reindex(self):
+        """예정 시각이 지난 경로를 재색인합니다. (대기 중인 경로가 없으면 종료)"""
+        while True:
+            time.sleep(REINDEX_CHECK_INTERVAL)
+            now = time.monotonic()
+            with self._pending_lock:
+                due = [path for path, due_at in self._pending_reindex.items() if due_at <= now]
+                for path in due:
+                    del self._pending_reindex[path]
+                if not due and not self._pending_reindex:
+                    self._reindex_thread = None
+                    return
+            
+            for path in due:
+                self._reindex_modified(path)
+    
+    @_with_database_lock
+    def _reindex_modified(self, path: str):
+        """
+        수정된 파일/이미지 폴더의 레코드를 갱신합니다.
+        크기/수정일이 같으면 건너뛰고, 달라도 내용 지문이 같으면 메타데이터만 갱신합니다.
+        내용이 실제로 바뀐 경우에만 썸네일을 초기화하고, 더 이상 참조되지 않는 이전 파생물을 삭제합니다.
+        """
+        try:
+            db = self._open_session()
+            record = db.query(MedicalRecord).filter(MedicalRecord.file_path == path).first()
+            if not record:
+                return
+            
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                # 삭제/이동 이벤트에서 처리
+                return
+            
+            # 폴더는 하위 이미지 크기만 바뀌면 mtime이 그대로이므로 항상 지문으로 비교 (목록만 읽음)
+            is_folder = record.file_type == 'IMAGE_FOLDER'
+            file_size = None if is_folder else stat.st_size
+            modified_date = datetime.fromtimestamp(stat.st_mtime)
+            if (not is_folder and record.file_size == file_size
+                    and record.file_modified_date == modified_date):
+                return
+            
+            fingerprint = self._compute_fingerprint(path)
+            record.file_size = file_size
+            record.file_modified_date = modified_date
+            
+            if fingerprint is not None and fingerprint == record.content_fingerprint:
+                db.commit()
+                self.logger.debug(f"내용 변경 없음 (메타데이터만 갱신): {path}")
+                return
+            
+            previous_fingerprint = record.content_fingerprint
+            record.content_fingerprint = fingerprint
+            record.thumbnail_path = None
+            record.modified_at = datetime.now()
+            record_event(db, "updated", record)
+            db.commit()
+            self.logger.info(f"내용 변경 재색인: {path}")
+            
+            # 같은 내용의 다른 레코드가 남아 있으면 파생물을 계속 사용하므로 유지
+            if previous_fingerprint and not db.query(MedicalRecord.id).filter(
+                MedicalRecord.content_fingerprint == previous_fingerprint
+            ).first():
+                removed = remove_derivatives(previous_fingerprint)
+                if removed:
+                    self.logger.info(f"이전 파생물 삭제: {previous_fingerprint} ({removed}건)")
+            
+        except Exception as e:
+            self.logger.error(f"재색인 실패: {path} - {str(e)}")
+            if 'db' in locals():
+                db.rollback()
+        finally:
+            if 'db' in locals():
+                db.close()
     
     def _process_file(self, file_path: str, action: str = "created"):
         """개별 파일 처리"""
@@ -127,7 +309,7 @@ class MedicalFileHandler(FileSystemEventHandler):
         except Exception as e:
             self.logger.error(f"폴더 처리 중 오류: {dir_path} - {str(e)}")
     
-    def _collect_file_info(self, file_path: str) -> Dict:
+    def _collect_file_info(self, file_path: str, with_fingerprint: bool = True) -> Dict:
         """파일/폴더의 메타데이터 수집"""
         try:
             stat = os.stat(file_path)
@@ -138,15 +320,27 @@ class MedicalFileHandler(FileSystemEventHandler):
                 'file_size': stat.st_size if os.path.isfile(file_path) else None,
                 'file_creation_date': datetime.fromtimestamp(stat.st_ctime),
                 'file_modified_date': datetime.fromtimestamp(stat.st_mtime),
+                'content_fingerprint': (
+                    self._compute_fingerprint(file_path) if with_fingerprint else None
+                ),
             }
         except Exception as e:
             self.logger.error(f"파일 정보 수집 실패: {file_path} - {str(e)}")
             return {}
     
+    def _compute_fingerprint(self, file_path: str):
+        """내용 지문 계산 (실패해도 인덱싱은 계속 진행)"""
+        try:
+            return compute_fingerprint(file_path)
+        except Exception as e:
+            self.logger.warning(f"내용 지문 계산 실패: {file_path} - {str(e)}")
+            return None
+    
+    @_with_database_lock
     def _save_to_database(self, file_info: Dict):
         """데이터베이스에 파일 정보 저장"""
         try:
-            db = get_db_session()
+            db = self._open_session()
             
             # 중복 확인
             existing = db.query(MedicalRecord).filter(
@@ -164,12 +358,15 @@ class MedicalFileHandler(FileSystemEventHandler):
                 file_path=file_info['file_path'],
                 file_type=file_info['file_type'],
                 file_size=file_info.get('file_size'),
+                content_fingerprint=file_info.get('content_fingerprint'),
                 file_creation_date=file_info.get('file_creation_date'),
                 file_modified_date=file_info.get('file_modified_date'),
                 parsing_confidence=file_info.get('confidence', 0.0)
             )
             
             db.add(record)
+            db.flush()
+            record_event(db, "created", record)
             db.commit()
             
             self.logger.info(f"데이터베이스 저장 완료: ID {record.id}")
@@ -182,19 +379,43 @@ class MedicalFileHandler(FileSystemEventHandler):
             if 'db' in locals():
                 db.close()
     
+    def _covered_by_subtree_op(self, path: str) -> bool:
+        """path가 최근 폴더 단위로 처리한 이동/삭제의 하위 항목인지 확인합니다."""
+        now = time.monotonic()
+        for prefix, handled_at in list(self._recent_subtree_ops.items()):
+            if now - handled_at > SUBTREE_EVENT_WINDOW:
+                del self._recent_subtree_ops[prefix]
+            elif path.startswith(prefix):
+                return True
+        return False
+    
+    def _forget_subtree_op(self, path: str):
+        """삭제/이동했던 폴더 자리에 다시 생성되거나 옮겨 온 항목은 이후 이벤트를 정상 처리하도록 기록을 지웁니다."""
+        created_prefix = _subtree_prefix(path)
+        for prefix in list(self._recent_subtree_ops):
+            if path.startswith(prefix) or prefix.startswith(created_prefix):
+                del self._recent_subtree_ops[prefix]
+    
+    @_with_database_lock
     def _remove_from_database(self, file_path: str):
-        """데이터베이스에서 파일 정보 삭제"""
+        """데이터베이스에서 파일 정보 삭제 (폴더인 경우 하위 레코드 포함)"""
         try:
-            db = get_db_session()
+            db = self._open_session()
+            condition = _path_or_subtree(file_path)
             
-            record = db.query(MedicalRecord).filter(
-                MedicalRecord.file_path == file_path
-            ).first()
+            # 삭제 알림에 필요한 정보만 조회
+            records = db.query(
+                MedicalRecord.id, MedicalRecord.patient_name, MedicalRecord.patient_id,
+                MedicalRecord.file_path,
+            ).filter(condition).all()
             
-            if record:
-                db.delete(record)
+            if records:
+                for record in records:
+                    record_event(db, "deleted", record)
+                db.query(MedicalRecord).filter(condition).delete(synchronize_session=False)
                 db.commit()
-                self.logger.info(f"데이터베이스에서 삭제: {file_path}")
+                self._recent_subtree_ops[_subtree_prefix(file_path)] = time.monotonic()
+                self.logger.info(f"데이터베이스에서 삭제: {file_path} ({len(records)}건)")
             
         except Exception as e:
             self.logger.error(f"데이터베이스 삭제 실패: {file_path} - {str(e)}")
@@ -204,20 +425,52 @@ class MedicalFileHandler(FileSystemEventHandler):
             if 'db' in locals():
                 db.close()
     
+    @_with_database_lock
     def _update_file_path(self, old_path: str, new_path: str):
-        """파일 경로 업데이트"""
+        """파일 경로 업데이트 (폴더인 경우 하위 레코드의 경로 접두어도 함께 변경)"""
         try:
-            db = get_db_session()
+            db = self._open_session()
+            condition = _path_or_subtree(old_path)
             
-            record = db.query(MedicalRecord).filter(
-                MedicalRecord.file_path == old_path
-            ).first()
+            # 이동 전 경로 (재구축 중인 인덱스에 이동을 반영하기 위해 이벤트에 기록)
+            previous_paths = dict(
+                db.query(MedicalRecord.id, MedicalRecord.file_path).filter(condition).all()
+            )
+            record_ids = list(previous_paths)
             
-            if record:
-                record.file_path = new_path
-                record.modified_at = datetime.now()
+            if record_ids:
+                # 이동 대상 경로에 이미 남아 있는 레코드는 고유 경로 충돌을 막기 위해 정리
+                stale = db.query(
+                    MedicalRecord.id, MedicalRecord.patient_name, MedicalRecord.patient_id,
+                    MedicalRecord.file_path,
+                ).filter(_path_or_subtree(new_path)).all()
+                for record in stale:
+                    record_event(db, "deleted", record)
+                if stale:
+                    db.query(MedicalRecord).filter(
+                        _path_or_subtree(new_path)
+                    ).delete(synchronize_session=False)
+                
+                old_prefix = _subtree_prefix(old_path)
+                new_prefix = _subtree_prefix(new_path)
+                db.query(MedicalRecord).filter(condition).update({
+                    MedicalRecord.file_path: case(
+                        (MedicalRecord.file_path == old_path, new_path),
+                        else_=literal(new_prefix).concat(
+                            func.substr(MedicalRecord.file_path, len(old_prefix) + 1)
+                        ),
+                    ),
+                    MedicalRecord.modified_at: datetime.now(),
+                }, synchronize_session=False)
+                
+                for index in range(0, len(record_ids), ID_CHUNK_SIZE):
+                    chunk = record_ids[index:index + ID_CHUNK_SIZE]
+                    for record in db.query(MedicalRecord).filter(MedicalRecord.id.in_(chunk)):
+                        record_event(db, "updated", record, file_path=previous_paths[record.id])
+                
                 db.commit()
-                self.logger.info(f"경로 업데이트: {old_path} -> {new_path}")
+                self._recent_subtree_ops[old_prefix] = time.monotonic()
+                self.logger.info(f"경로 업데이트: {old_path} -> {new_path} ({len(record_ids)}건)")
             
         except Exception as e:
             self.logger.error(f"경로 업데이트 실패: {str(e)}")
@@ -233,9 +486,13 @@ class FileWatcher:
     
     def __init__(self, config_path: str = "../config/nas_paths.json"):
         self.config_path = config_path
-        self.observer = Observer()
+        self.observer = None
         self.handler = MedicalFileHandler()
         self.watch_paths = []
+        # 감시 방식: "native" (OS 이벤트) 또는 "mtime_poll" (네트워크 공유용 폴링)
+        self.watch_mode = "native"
+        self.poll_interval = 5.0
+        self.poll_recheck_files = FILE_RECHECK_PER_POLL
         
     def load_config(self):
         """설정 파일에서 감시할 경로들을 로드"""
@@ -243,8 +500,11 @@ class FileWatcher:
             with open(self.config_path, 'r', encoding='utf-8') as f:
                 config = json.load(f)
                 self.watch_paths = config.get('nas_paths', [])
+                self.watch_mode = config.get('watch_mode', 'native')
+                self.poll_interval = float(config.get('poll_interval', 5.0))
+                self.poll_recheck_files = int(config.get('poll_recheck_files', FILE_RECHECK_PER_POLL))
                 
-            print(f"감시 경로 {len(self.watch_paths)}개 로드됨")
+            print(f"감시 경로 {len(self.watch_paths)}개 로드됨 (감시 방식: {self.watch_mode})")
             for path in self.watch_paths:
                 print(f"  - {path}")
                 
@@ -256,9 +516,24 @@ class FileWatcher:
             print(f"설정 파일 로드 실패: {e}")
             self.watch_paths = ["../demodata"]
     
+    def _create_observer(self):
+        """
+        감시 방식에 맞는 Observer를 생성합니다.
+        SMB/NFS 공유처럼 OS 이벤트가 오지 않는 경로는 디렉토리 mtime 기반 폴링을 사용합니다.
+        """
+        if self.watch_mode == "mtime_poll":
+            snapshot_dir = os.path.join(
+                os.path.dirname(os.path.abspath(__file__)), "cache", "snapshots"
+            )
+            return MtimePollingObserver(
+                snapshot_dir, interval=self.poll_interval, recheck_per_poll=self.poll_recheck_files
+            )
+        return Observer()
+    
     def start_watching(self):
         """파일 시스템 감시 시작"""
         self.load_config()
+        self.observer = self._create_observer()
         
         # 각 경로에 대해 감시 설정
         for path in self.watch_paths:
@@ -278,6 +553,7 @@ class FileWatcher:
         try:
             while True:
                 time.sleep(1)
+                self.handler.check_database_switch()
         except KeyboardInterrupt:
             print("\n감시 중지 중...")
             self.observer.stop()